@@ -0,0 +1,331 @@
+"""
+Offline pricing backtest.
+
+Replays historical bookings under alternative `PricingParams` sets and reports revenue and
+load factor per set, so a pricing change can be evaluated before it ships.
+
+Replay model
+- Each booking is a demand event. Its hours-to-departure come from its
+  timestamp; its seat fill is reconstructed backwards from the flight's
+  current seats_available, adding back the seat held by that booking and
+  every later one (cancelled bookings have already released theirs). Seat
+  churn that no booking records (e.g. the simulator's) is invisible here.
+- Its demand index is inferred by inverting the current model on the last
+  fare_history quote recorded before the booking (the price the passenger
+  was shown, falling back to the price paid when there is none). The index
+  is not clamped, so whatever the reconstructed seat fill gets wrong,
+  churn included, is carried in it rather than dropped.
+- Under a candidate parameter set the event converts if the repriced fare
+  is within `tolerance` of what the passenger actually paid; revenue is
+  the sum of converted fares and load factor is converted bookings over the
+  seats of the replayed flights. Cancelled bookings never count as revenue.
+- The quote is an independent draw from the fare actually paid, so
+  `DEFAULT_PRICING` lands near the baseline rather than on it. The
+  baseline check (`check_baseline`, printed by the CLI) flags a replay
+  whose default-parameter revenue drifts by more than BASELINE_TOLERANCE,
+  which means the history no longer looks like it was priced by this model.
+
+Execution
+- Input is streamed from the DB in ordered chunks, never loaded whole.
+- Parameter sets are split across a process pool; each worker streams the
+  DB once and prices every event for all of its sets at once with numpy
+  (S x B matrices). Without numpy it falls back to a pure-Python loop.
+
+Usage
+    python -m backend.backtest --grid seat_weight=0.4,0.6,0.8 --grid demand_weight=0.3,0.5 --workers 8
+    python -m backend.backtest --params scenarios.json --out results.csv
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import create_engine, text, DateTime, Float
+
+from backend.pricing import DEFAULT_PRICING, TIERS, PricingParams, implied_demand, multiplier, multiplier_matrix
+
+try:  # numpy is optional; without it the backtest falls back to pure Python
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+DEFAULT_DB_URL = "sqlite:///./flights.db"  # same default as backend.main
+DEFAULT_TOLERANCE = 0.15
+DEFAULT_CHUNK = 10000
+BASELINE_TOLERANCE = 0.10  # max |revenue_vs_baseline| for DEFAULT_PRICING
+
+# seats_before: seats free just before each booking, worked backwards from the
+# flight's current seats_available by adding back every seat still held by
+# this or a later booking (cancelled bookings have already released theirs)
+BOOKINGS_SQL = text("""
+    SELECT b.flight_id, b.created_at, b.price_paid, b.status,
+           f.base_fare, f.total_seats, f.departure, COALESCE(a.tier, 'standard') AS tier,
+           f.seats_available + SUM(CASE WHEN COALESCE(b.status, '') = 'CANCELLED' THEN 0 ELSE 1 END) OVER (
+               PARTITION BY b.flight_id ORDER BY b.created_at, b.id
+               ROWS BETWEEN CURRENT ROW AND UNBOUNDED FOLLOWING
+           ) AS seats_before
+    FROM bookings b
+    JOIN flights f ON f.id = b.flight_id
+    LEFT JOIN airlines a ON a.id = f.airline_id
+    WHERE b.created_at IS NOT NULL AND b.price_paid IS NOT NULL
+    ORDER BY b.flight_id, b.created_at, b.id
+""").columns(created_at=DateTime, departure=DateTime, price_paid=Float, base_fare=Float)
+
+FARES_SQL = text("""
+    SELECT flight_id, recorded_at, price
+    FROM fare_history
+    WHERE recorded_at IS NOT NULL AND price IS NOT NULL
+    ORDER BY flight_id, recorded_at
+""").columns(recorded_at=DateTime, price=Float)
+
+_TIER_INDEX = {t: i for i, t in enumerate(TIERS)}
+
+
+class EventBatch:
+    """Column arrays for one chunk of demand events."""
+
+    __slots__ = ("base", "seat_pct", "hours", "demand", "tier", "wtp", "active", "paid")
+
+    def __init__(self, rows, tolerance):
+        base, seat_pct, hours, demand, tier, paid, active = zip(*rows) if rows else ((),) * 7
+        if np is not None:
+            self.base = np.asarray(base, dtype=np.float64)
+            self.seat_pct = np.asarray(seat_pct, dtype=np.float64)
+            self.hours = np.asarray(hours, dtype=np.float64)
+            self.demand = np.asarray(demand, dtype=np.float64)
+            self.tier = np.asarray([_TIER_INDEX.get(t, 1) for t in tier], dtype=np.intp)
+            self.paid = np.asarray(paid, dtype=np.float64)
+            self.active = np.asarray(active, dtype=bool)
+            self.wtp = self.paid * (1 + tolerance)
+        else:
+            self.base, self.seat_pct, self.hours, self.demand = base, seat_pct, hours, demand
+            self.tier, self.paid, self.active = tier, paid, active
+            self.wtp = [p * (1 + tolerance) for p in paid]
+
+    def __len__(self):
+        return len(self.base)
+
+    def baseline(self):
+        """(revenue, bookings) actually observed for the non-cancelled events."""
+        if np is not None:
+            return float(self.paid[self.active].sum()), int(self.active.sum())
+        kept = [p for p, a in zip(self.paid, self.active) if a]
+        return sum(kept), len(kept)
+
+
+def stream_events(engine, tolerance: float = DEFAULT_TOLERANCE, chunk_size: int = DEFAULT_CHUNK, totals=None):
+    """
+    Yield EventBatch chunks. `totals` (a dict) receives the number of replayed
+    flights and their seats once the stream is exhausted.
+    """
+    flights = seats = 0
+    with engine.connect() as bconn, engine.connect() as fconn:
+        bookings = bconn.execution_options(stream_results=True, yield_per=chunk_size).execute(BOOKINGS_SQL)
+        fares = iter(fconn.execution_options(stream_results=True, yield_per=chunk_size).execute(FARES_SQL))
+        fare = next(fares, None)
+
+        current, last_quote = None, None
+        rows = []
+        for flight_id, created_at, price_paid, status, base, total, departure, tier, seats_before in bookings:
+            if flight_id != current:
+                current, last_quote = flight_id, None
+                flights += 1
+                seats += total or 0
+            # merge-join: advance fare_history to the last quote strictly before this booking
+            while fare is not None and (fare.flight_id, fare.recorded_at) < (flight_id, created_at):
+                if fare.flight_id == flight_id:
+                    last_quote = fare.price
+                fare = next(fares, None)
+
+            seat_pct = min(max(seats_before, 0), total) / total if total else 0.0
+            hours = max((departure - created_at).total_seconds() / 3600, 0.0)
+            quote = last_quote or price_paid
+            demand = implied_demand(DEFAULT_PRICING, quote / base if base else 1.0, seat_pct, hours, tier,
+                                    bounded=False)
+            rows.append((base, seat_pct, hours, demand, tier, price_paid, status != "CANCELLED"))
+
+            if len(rows) >= chunk_size:
+                yield EventBatch(rows, tolerance)
+                rows = []
+        if rows:
+            yield EventBatch(rows, tolerance)
+
+    if totals is not None:
+        totals.update(flights=flights, seats=seats)
+
+
+def _evaluate_numpy(param_sets, batch, acc):
+    m = multiplier_matrix(param_sets, batch.seat_pct, batch.hours, batch.demand, batch.tier)
+    prices = np.round(batch.base[None, :] * m, 2)
+    converted = (prices <= batch.wtp[None, :]) & batch.active[None, :]
+    acc["revenue"] += np.where(converted, prices, 0.0).sum(axis=1)
+    acc["bookings"] += converted.sum(axis=1)
+
+
+def _evaluate_python(param_sets, batch, acc):
+    for s, params in enumerate(param_sets):
+        revenue = bookings = 0
+        for i in range(len(batch)):
+            if not batch.active[i]:
+                continue
+            price = round(batch.base[i] * multiplier(params, batch.seat_pct[i], batch.hours[i], batch.demand[i], batch.tier[i]), 2)
+            if price <= batch.wtp[i]:
+                revenue += price
+                bookings += 1
+        acc["revenue"][s] += revenue
+        acc["bookings"][s] += bookings
+
+
+def _run_partition(db_url: str, offset: int, param_dicts, tolerance: float, chunk_size: int):
+    """Worker entry point: stream the DB once and score every parameter set in this partition."""
+    param_sets = [PricingParams(**d) for d in param_dicts]
+    engine = create_engine(db_url, future=True)
+    size = len(param_sets)
+    if np is not None:
+        acc = {"revenue": np.zeros(size), "bookings": np.zeros(size, dtype=np.int64)}
+        evaluate = _evaluate_numpy
+    else:
+        acc = {"revenue": [0.0] * size, "bookings": [0] * size}
+        evaluate = _evaluate_python
+
+    totals = {}
+    baseline_revenue, baseline_bookings, events = 0.0, 0, 0
+    for batch in stream_events(engine, tolerance, chunk_size, totals):
+        evaluate(param_sets, batch, acc)
+        events += len(batch)
+        revenue, bookings = batch.baseline()
+        baseline_revenue += revenue
+        baseline_bookings += bookings
+    engine.dispose()
+
+    seats = totals.get("seats", 0)
+    baseline = {
+        "revenue": round(baseline_revenue, 2),
+        "bookings": baseline_bookings,
+        "load_factor": round(baseline_bookings / seats, 4) if seats else 0.0,
+    }
+    results = []
+    for i, params in enumerate(param_sets):
+        revenue, bookings = float(acc["revenue"][i]), int(acc["bookings"][i])
+        results.append({
+            "scenario": offset + i,
+            "params": params.as_dict(),
+            "revenue": round(revenue, 2),
+            "bookings": bookings,
+            "load_factor": round(bookings / seats, 4) if seats else 0.0,
+            "revenue_vs_baseline": round(revenue / baseline_revenue - 1, 4) if baseline_revenue else 0.0,
+        })
+    return {"events": events, "flights": totals.get("flights", 0), "seats": seats, "baseline": baseline, "results": results}
+
+
+def run_backtest(param_sets, db_url: str = DEFAULT_DB_URL, workers: int = None,
+                 tolerance: float = DEFAULT_TOLERANCE, chunk_size: int = DEFAULT_CHUNK) -> dict:
+    """Score `param_sets` against the history in `db_url`, in parallel across `workers` processes."""
+    param_sets = list(param_sets)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(param_sets)))
+    per = -(-len(param_sets) // workers)
+    partitions = [(i, [p.as_dict() for p in param_sets[i:i + per]]) for i in range(0, len(param_sets), per)]
+
+    started = time.perf_counter()
+    if workers == 1:
+        outputs = [_run_partition(db_url, off, dicts, tolerance, chunk_size) for off, dicts in partitions]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_run_partition, db_url, off, dicts, tolerance, chunk_size) for off, dicts in partitions]
+            outputs = [f.result() for f in futures]
+
+    first = outputs[0]
+    results = sorted((r for out in outputs for r in out["results"]), key=lambda r: r["revenue"], reverse=True)
+    return {
+        "events": first["events"],
+        "flights": first["flights"],
+        "seats": first["seats"],
+        "baseline": first["baseline"],
+        "scenarios": len(results),
+        "workers": workers,
+        "vectorized": np is not None,
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+        "results": results,
+    }
+
+
+def check_baseline(report: dict, tolerance: float = BASELINE_TOLERANCE):
+    """
+    Revenue drift of the DEFAULT_PRICING scenario against the observed
+    baseline, and whether it is within `tolerance`. (None, True) when the
+    report has no default scenario.
+    """
+    defaults = DEFAULT_PRICING.as_dict()
+    for r in report["results"]:
+        if r["params"] == defaults:
+            return r["revenue_vs_baseline"], abs(r["revenue_vs_baseline"]) <= tolerance
+    return None, True
+
+
+def grid(base: PricingParams = DEFAULT_PRICING, **axes):
+    """Cartesian product of parameter overrides, e.g. grid(seat_weight=[0.4, 0.6], demand_weight=[0.3, 0.5])."""
+    names = list(axes)
+    for values in itertools.product(*(axes[n] for n in names)):
+        yield base.with_overrides(**dict(zip(names, values)))
+
+
+def _parse_axis(spec: str):
+    name, _, values = spec.partition("=")
+    if name not in PricingParams.field_names() or not values:
+        raise argparse.ArgumentTypeError(f"expected <param>=v1,v2,... with param in {PricingParams.field_names()}")
+    return name, [float(v) for v in values.split(",")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest pricing parameter sets against booking history")
+    parser.add_argument("--db", default=DEFAULT_DB_URL, help="SQLAlchemy URL of the history DB")
+    parser.add_argument("--grid", action="append", type=_parse_axis, default=[], help="param=v1,v2,... (repeatable)")
+    parser.add_argument("--params", help="JSON file with a list of parameter override objects")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK)
+    parser.add_argument("--out", help="write all results to .csv or .json")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    param_sets = [DEFAULT_PRICING]
+    if args.params:
+        with open(args.params, encoding="utf-8") as fh:
+            param_sets += [DEFAULT_PRICING.with_overrides(**o) for o in json.load(fh)]
+    if args.grid:
+        param_sets += list(grid(**dict(args.grid)))
+
+    report = run_backtest(param_sets, args.db, args.workers, args.tolerance, args.chunk_size)
+
+    print(f"Replayed {report['events']} bookings on {report['flights']} flights "
+          f"({report['scenarios']} scenarios, {report['workers']} workers, "
+          f"{'numpy' if report['vectorized'] else 'pure python'}) in {report['elapsed_seconds']}s")
+    print(f"Baseline: revenue ₹{report['baseline']['revenue']:,.2f}, load factor {report['baseline']['load_factor']:.2%}")
+    drift, ok = check_baseline(report)
+    if not ok:
+        print(f"WARNING: default parameters replay at {drift:+.2%} vs baseline "
+              f"(tolerance ±{BASELINE_TOLERANCE:.0%}); results are not comparable")
+    for r in report["results"][:args.top]:
+        changed = {k: v for k, v in r["params"].items() if getattr(DEFAULT_PRICING, k) != v} or "defaults"
+        print(f"#{r['scenario']:>4}  revenue ₹{r['revenue']:>14,.2f} ({r['revenue_vs_baseline']:+.2%})  "
+              f"load {r['load_factor']:.2%}  {changed}")
+
+    if args.out:
+        if args.out.endswith(".json"):
+            with open(args.out, "w", encoding="utf-8") as fh:
+                json.dump(report, fh, indent=2, default=str)
+        else:
+            with open(args.out, "w", newline="", encoding="utf-8") as fh:
+                writer = csv.writer(fh)
+                names = PricingParams.field_names()
+                writer.writerow(["scenario", "revenue", "bookings", "load_factor", "revenue_vs_baseline", *names])
+                for r in report["results"]:
+                    writer.writerow([r["scenario"], r["revenue"], r["bookings"], r["load_factor"],
+                                     r["revenue_vs_baseline"], *(r["params"][n] for n in names)])
+
+
+if __name__ == "__main__":
+    main()
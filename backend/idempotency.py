@@ -0,0 +1,207 @@
+"""
+Idempotency keys for booking mutations.
+
+A client that sends `Idempotency-Key: <uuid>` with a booking write gets the
+exact same response for every retry of that request, and the transaction
+runs only once:
+
+- Fast path: completed responses are kept in a bounded in-memory map, so a
+  replay in the same worker never touches the DB.
+- Durable path: responses are stored in the indexed `idempotency_keys`
+  table, so replays that land on another worker (or after a restart within
+  the TTL) are answered from there.
+- Concurrent duplicates: the first request claims the key (an in-process
+  asyncio.Event plus a pending DB row for other workers); duplicates wait
+  for it to finish and then replay its response instead of racing it. The
+  waits are async (event / asyncio.sleep polling), so a retry storm holds
+  no threadpool threads; the handler itself still runs in the threadpool.
+
+Failed requests (HTTPException / errors) release the key without storing
+anything, so the client can retry them. So does a request whose response
+could not be stored after the handler succeeded; its worker still replays
+it from memory. A pending key is never re-run: if its worker died between
+committing the booking and storing the response, the booking may exist, so
+duplicates get 409 until the key expires (TTL).
+Reusing a key with a different payload is rejected with 422.
+"""
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+DEFAULT_TTL = timedelta(hours=24)
+WAIT_TIMEOUT = 30.0  # seconds a duplicate waits for the in-flight original
+POLL_INTERVAL = 0.05
+MAX_MEMORY_ENTRIES = 10000
+REPLAY_HEADER = "Idempotent-Replayed"
+
+
+def fingerprint(scope: str, payload) -> str:
+    raw = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{scope}|{raw}".encode()).hexdigest()
+
+
+class IdempotencyStore:
+    def __init__(self, session_factory, model, ttl: timedelta = DEFAULT_TTL, max_entries: int = MAX_MEMORY_ENTRIES):
+        self.session_factory = session_factory
+        self.model = model
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._memory = OrderedDict()  # key -> (expires_at, request_hash, status_code, body)
+        self._inflight = {}  # key -> asyncio.Event (only touched from the event loop)
+        self._lock = threading.Lock()
+
+    # ---------- storage ----------
+    def _remember(self, key, request_hash, status_code, body):
+        with self._lock:
+            self._memory[key] = (time.monotonic() + self.ttl.total_seconds(), request_hash, status_code, body)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _from_memory(self, key):
+        with self._lock:
+            hit = self._memory.get(key)
+            if hit and hit[0] < time.monotonic():
+                del self._memory[key]
+                return None
+            return hit
+
+    def _is_dead(self, row) -> bool:
+        return datetime.utcnow() - row.created_at > self.ttl
+
+    def _load(self, key):
+        """Returns the DB row as (request_hash, status_code, body), or None. status_code None = pending."""
+        db = self.session_factory()
+        try:
+            row = db.get(self.model, key)
+            if row is None or self._is_dead(row):
+                return None
+            return row.request_hash, row.status_code, row.response_body
+        finally:
+            db.close()
+
+    def _claim(self, key, request_hash) -> bool:
+        db = self.session_factory()
+        try:
+            stale = db.get(self.model, key)
+            if stale is not None and self._is_dead(stale):
+                db.delete(stale)
+                db.flush()
+            db.add(self.model(key=key, request_hash=request_hash, created_at=datetime.utcnow()))
+            db.commit()
+            return True
+        except IntegrityError:
+            db.rollback()
+            return False
+        finally:
+            db.close()
+
+    def _complete(self, key, status_code, body):
+        db = self.session_factory()
+        try:
+            row = db.get(self.model, key)
+            if row is not None:
+                row.status_code = status_code
+                row.response_body = json.dumps(body)
+                db.commit()
+        finally:
+            db.close()
+
+    def _release(self, key):
+        db = self.session_factory()
+        try:
+            db.query(self.model).filter(self.model.key == key, self.model.status_code.is_(None)).delete()
+            db.commit()
+        finally:
+            db.close()
+
+    # ---------- request handling ----------
+    @staticmethod
+    def _replay(request_hash, stored_hash, status_code, body):
+        if stored_hash != request_hash:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+        if isinstance(body, str):
+            body = json.loads(body)
+        return JSONResponse(content=body, status_code=status_code, headers={REPLAY_HEADER: "true"})
+
+    async def run(self, scope: str, idempotency_key: Optional[str], payload, handler: Callable[[], dict]):
+        """Run `handler` once per (scope, key); later calls with the same key replay its response."""
+        if not idempotency_key:
+            return await run_in_threadpool(handler)
+        key = f"{scope}:{idempotency_key}"
+        request_hash = fingerprint(scope, payload)
+        deadline = time.monotonic() + WAIT_TIMEOUT
+
+        while True:
+            hit = self._from_memory(key)
+            if hit:
+                return self._replay(request_hash, hit[1], hit[2], hit[3])
+
+            waiter = self._inflight.get(key)
+            if waiter is not None:  # same-worker duplicate: wait for the original
+                try:
+                    await asyncio.wait_for(waiter.wait(), max(deadline - time.monotonic(), 0))
+                except asyncio.TimeoutError:
+                    raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+                continue
+
+            own = self._inflight[key] = asyncio.Event()
+            try:
+                stored = await run_in_threadpool(self._load, key)
+                if stored and stored[1] is not None:
+                    self._remember(key, *stored[:2], json.loads(stored[2]))
+                    return self._replay(request_hash, *stored)
+                if stored is None and await run_in_threadpool(self._claim, key, request_hash):
+                    return await self._execute(key, request_hash, handler)
+            finally:
+                self._inflight.pop(key, None)
+                own.set()
+
+            # another worker holds the claim (or died holding it): poll until it completes or we give up
+            if stored and stored[0] != request_hash:
+                raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+            if time.monotonic() >= deadline:
+                raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+            await asyncio.sleep(POLL_INTERVAL)
+
+    async def _execute(self, key, request_hash, handler):
+        try:
+            result = await run_in_threadpool(handler)
+        except Exception:  # not on cancellation: the handler may have committed, so the key stays pending
+            await run_in_threadpool(self._release, key)
+            raise
+        body = jsonable_encoder(result)
+        self._remember(key, request_hash, 200, body)
+        try:
+            await run_in_threadpool(self._complete, key, 200, body)
+        except Exception:
+            # the handler committed but its response could not be stored: release the
+            # claim rather than leave the key pending for the whole TTL (this worker
+            # still replays it from memory)
+            await run_in_threadpool(self._release, key)
+        return result
+
+    def purge_expired(self) -> int:
+        """Delete keys older than the TTL (DB and memory); returns the number of DB rows removed."""
+        now = time.monotonic()
+        with self._lock:
+            for key in [k for k, v in self._memory.items() if v[0] < now]:
+                del self._memory[key]
+        db = self.session_factory()
+        try:
+            removed = db.query(self.model).filter(self.model.created_at < datetime.utcnow() - self.ttl).delete()
+            db.commit()
+            return removed
+        finally:
+            db.close()
@@ -0,0 +1,213 @@
+"""
+In-process snapshot of the flight catalogue.
+
+Hot read paths (/dynamic_price, /seat_price, search hydration, simulator
+pricing) read compact `FlightRecord`s from here instead of re-querying the
+`flights` table and lazy-loading `Airline` for every row. The airline name
+and tier are denormalized into each record at load time.
+
+The snapshot is loaded at startup and kept current by write-through: every
+code path that changes seats or fares in the DB calls `set_seats()` /
+`upsert()` right after committing. `generation` increments on every write
+(and each record remembers the generation it was last written at), so
+callers can tell whether anything changed between two reads and
+`verify()` can compare the snapshot against the DB.
+
+The snapshot is per process. Writes made elsewhere (other workers,
+re-seeding, manual edits) are picked up by `reconcile()`, which the app
+runs against the full flights table once per simulator tick; records
+written through after that table was read are newer and are kept.
+"""
+import threading
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+
+# Column order of FlightOut; FlightRecord.as_row() follows it
+FLIGHT_COLUMNS = (
+    "id", "flight_no", "origin", "destination", "departure", "arrival",
+    "base_fare", "seats_available", "total_seats", "airline_name",
+)
+
+
+class FlightRecord:
+    __slots__ = (
+        "id", "flight_no", "airline_id", "airline_name", "airline_tier",
+        "origin", "destination", "departure", "arrival",
+        "base_fare", "total_seats", "seats_available", "version",
+    )
+
+    def __init__(self, id: int, flight_no: str, airline_id: Optional[int], airline_name: Optional[str],
+                 airline_tier: Optional[str], origin: str, destination: str, departure: datetime,
+                 arrival: datetime, base_fare: float, total_seats: int, seats_available: int, version: int = 0):
+        self.id = id
+        self.flight_no = flight_no
+        self.airline_id = airline_id
+        self.airline_name = airline_name
+        self.airline_tier = airline_tier or "standard"
+        self.origin = origin
+        self.destination = destination
+        self.departure = departure
+        self.arrival = arrival
+        self.base_fare = float(base_fare)
+        self.total_seats = total_seats
+        self.seats_available = seats_available
+        self.version = version
+
+    def as_row(self) -> tuple:
+        return (self.id, self.flight_no, self.origin, self.destination, self.departure, self.arrival,
+                self.base_fare, self.seats_available, self.total_seats, self.airline_name)
+
+    def catalogue(self) -> tuple:
+        """Everything except the seat count, for change detection."""
+        return (self.flight_no, self.airline_id, self.airline_name, self.airline_tier, self.origin,
+                self.destination, self.departure, self.arrival, self.base_fare, self.total_seats)
+
+    def as_dict(self) -> dict:
+        return {
+            "id": self.id, "flight_no": self.flight_no, "origin": self.origin,
+            "destination": self.destination, "departure": self.departure, "arrival": self.arrival,
+            "base_fare": self.base_fare, "seats_available": self.seats_available,
+            "total_seats": self.total_seats, "airline_name": self.airline_name,
+        }
+
+
+class FlightInventory:
+    def __init__(self):
+        self._records = {}
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.loaded = False
+        self._listeners = []
+
+    def add_listener(self, fn):
+        """
+        Register fn(event, record) for catalogue changes: ("load", None),
+        ("upsert", record) or ("remove", record). Seat updates are not
+        reported; records are mutated in place so readers see them anyway.
+        Listeners are called under the snapshot lock, so they see changes in
+        the order they were made; they must not write to the snapshot.
+        """
+        self._listeners.append(fn)
+
+    def _notify(self, event: str, record: Optional[FlightRecord]):
+        for fn in self._listeners:
+            fn(event, record)
+
+    def load(self, rows: Iterable[tuple]):
+        """
+        Replace the snapshot. Each row is
+        (id, flight_no, airline_id, airline_name, airline_tier, origin, destination,
+         departure, arrival, base_fare, total_seats, seats_available).
+        """
+        with self._lock:
+            self.generation += 1
+            self._records = {row[0]: FlightRecord(*row, version=self.generation) for row in rows}
+            self.loaded = True
+            self._notify("load", None)
+
+    def get(self, flight_id: int) -> Optional[FlightRecord]:
+        return self._records.get(flight_id)
+
+    def get_many(self, flight_ids: Iterable[int]) -> List[FlightRecord]:
+        records = self._records
+        return [records[i] for i in flight_ids if i in records]
+
+    def all(self) -> List[FlightRecord]:
+        return list(self._records.values())
+
+    def __len__(self):
+        return len(self._records)
+
+    def upsert(self, row: tuple) -> FlightRecord:
+        with self._lock:
+            return self._upsert(row)
+
+    def _upsert(self, row: tuple) -> FlightRecord:
+        self.generation += 1
+        record = FlightRecord(*row, version=self.generation)
+        previous = self._records.get(record.id)
+        self._records[record.id] = record
+        if previous is not None:
+            self._notify("remove", previous)
+        self._notify("upsert", record)
+        return record
+
+    def set_seats(self, flight_id: int, seats_available: int) -> bool:
+        """Write-through after a committed seat change; returns False if the flight is unknown."""
+        with self._lock:
+            record = self._records.get(flight_id)
+            if record is None:
+                return False
+            self._set_seats(record, seats_available)
+            return True
+
+    def _set_seats(self, record: FlightRecord, seats_available: int):
+        self.generation += 1
+        record.seats_available = seats_available
+        record.version = self.generation
+
+    def remove(self, flight_id: int):
+        with self._lock:
+            self._remove(flight_id)
+
+    def _remove(self, flight_id: int) -> Optional[FlightRecord]:
+        record = self._records.pop(flight_id, None)
+        if record is not None:
+            self.generation += 1
+            self._notify("remove", record)
+        return record
+
+    def verify(self, seat_rows: Iterable[tuple]) -> dict:
+        """Compare (id, seats_available) rows from the DB with the snapshot."""
+        generation = self.generation
+        missing, stale = [], []
+        seen = 0
+        for flight_id, seats in seat_rows:
+            seen += 1
+            record = self._records.get(flight_id)
+            if record is None:
+                missing.append(flight_id)
+            elif record.seats_available != seats:
+                stale.append(flight_id)
+        return {
+            "generation": generation,
+            "changed_during_check": self.generation != generation,
+            "db_flights": seen,
+            "snapshot_flights": len(self._records),
+            "missing": missing,
+            "stale": stale,
+        }
+
+    def reconcile(self, rows: Iterable[tuple], since: Optional[int] = None) -> dict:
+        """
+        Bring the snapshot in line with full DB rows (same shape as load()).
+        Flights whose catalogue fields changed are replaced, flights no
+        longer in the DB are dropped and seat-only changes are applied in
+        place. `since` is the generation read before the rows were queried:
+        records written after it (e.g. a booking's write-through) are newer
+        than the rows and are left alone. Returns {"seats": [(id, seats)],
+        "replaced": [(old record or None, new record)], "removed": [record]}.
+        """
+        rows = list(rows)
+        seen = set()
+        seats, replaced, removed = [], [], []
+        with self._lock:
+            for row in rows:
+                seen.add(row[0])
+                record = self._records.get(row[0])
+                if record is not None and since is not None and record.version > since:
+                    continue
+                fresh = FlightRecord(*row)
+                if record is None or record.catalogue() != fresh.catalogue():
+                    replaced.append((record, self._upsert(row)))
+                elif record.seats_available != fresh.seats_available:
+                    self._set_seats(record, fresh.seats_available)
+                    seats.append((fresh.id, fresh.seats_available))
+            for flight_id, record in list(self._records.items()):
+                if flight_id not in seen and (since is None or record.version <= since):
+                    removed.append(self._remove(flight_id))
+        return {"seats": seats, "replaced": replaced, "removed": removed}
+
+
+inventory = FlightInventory()
@@ -0,0 +1,154 @@
+"""
+Leader election for background jobs across uvicorn workers.
+
+Every worker runs `lifespan`, so without coordination `uvicorn --workers N`
+starts N simulator loops and N reapers. Instead, each worker campaigns for a
+lease row in the shared database; only the holder runs the leader jobs
+(simulator, reapers).
+
+- Acquire/renew is a single UPDATE ... WHERE holder = me OR expired, with an
+  INSERT for the first claim; the primary key makes a racing INSERT fail, so
+  at most one worker holds the lease.
+- The holder renews every `ttl / 4` seconds. A timer set at its own lease
+  deadline cancels the leader jobs if no renewal has landed by then, even
+  while a renew is still blocked on the database, so it stops before anyone
+  else can take over. Leader jobs should also check `is_leader` before each
+  write, since a cancelled task only stops at its next await.
+- Graceful shutdown releases the lease, so a follower takes over on its
+  next poll. After a crash the lease is taken over within `ttl` plus one
+  poll. Both are well under the 60s simulator tick.
+
+Set FLIGHTSIM_LEADER_TTL to tune the lease length (seconds). Workers are
+assumed to share a host clock, which holds for the single-file SQLite setup.
+"""
+import asyncio
+import os
+import socket
+import time
+import uuid
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+LEASE_TTL = float(os.getenv("FLIGHTSIM_LEADER_TTL", "20"))
+DEFAULT_LEASE = "background-jobs"
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class LeaderLease:
+    def __init__(self, session_factory, model, name: str = DEFAULT_LEASE, ttl: float = LEASE_TTL,
+                 holder: Optional[str] = None):
+        self.session_factory = session_factory
+        self.model = model
+        self.name = name
+        self.ttl = ttl
+        self.holder = holder or worker_id()
+        self._deadline = 0.0  # monotonic time our current lease runs out
+        self.changes = 0  # leadership transitions seen by this worker
+
+    @property
+    def renew_interval(self) -> float:
+        return self.ttl / 4
+
+    @property
+    def is_leader(self) -> bool:
+        return time.monotonic() < self._deadline
+
+    def try_acquire(self) -> bool:
+        """Acquire or renew the lease; returns whether this worker now holds it."""
+        started = time.monotonic()
+        now = time.time()
+        m = self.model
+        db = self.session_factory()
+        try:
+            claimed = (
+                db.query(m)
+                .filter(m.name == self.name, or_(m.holder == self.holder, m.expires_at < now))
+                .update({m.holder: self.holder, m.expires_at: now + self.ttl}, synchronize_session=False)
+            )
+            if not claimed:
+                db.add(m(name=self.name, holder=self.holder, expires_at=now + self.ttl))
+            db.commit()
+        except IntegrityError:  # held by another worker
+            db.rollback()
+            self._deadline = 0.0
+            return False
+        except SQLAlchemyError:  # DB busy: keep what we have until it runs out
+            db.rollback()
+            return self.is_leader
+        finally:
+            db.close()
+        # measured from before the UPDATE, so we always stop before the row expires
+        self._deadline = started + self.ttl
+        return True
+
+    def release(self):
+        self._deadline = 0.0
+        m = self.model
+        db = self.session_factory()
+        try:
+            db.query(m).filter(m.name == self.name, m.holder == self.holder).delete(synchronize_session=False)
+            db.commit()
+        except SQLAlchemyError:
+            db.rollback()
+        finally:
+            db.close()
+
+    def current(self) -> Optional[dict]:
+        db = self.session_factory()
+        try:
+            row = db.get(self.model, self.name)
+            if row is None:
+                return None
+            return {"holder": row.holder, "expires_in": round(row.expires_at - time.time(), 3)}
+        finally:
+            db.close()
+
+    async def campaign(self, leader_jobs: Iterable[Callable]):
+        """
+        Run until cancelled: poll the lease and run `leader_jobs` while this
+        worker holds it. Jobs are coroutine factories; they are cancelled when
+        this worker loses leadership, and on shutdown.
+        """
+        leader_jobs = list(leader_jobs)
+        loop = asyncio.get_running_loop()
+        running, leading, step_down, acquiring = [], None, None, None
+
+        def switch(lead: bool):
+            nonlocal running, leading
+            for task in running:
+                task.cancel()
+            running = [asyncio.create_task(job()) for job in leader_jobs] if lead else []
+            leading = lead
+            self.changes += 1
+
+        def deadline_passed():
+            if leading and not self.is_leader:  # no renewal landed in time
+                switch(False)
+
+        try:
+            while True:
+                # shielded: cancelling a to_thread call does not stop the thread, so
+                # shutdown must be able to wait for an in-flight claim to land
+                acquiring = asyncio.ensure_future(asyncio.to_thread(self.try_acquire))
+                won = await asyncio.shield(acquiring) and self.is_leader
+                if won is not leading:
+                    switch(won)
+                if step_down is not None:
+                    step_down.cancel()
+                step_down = loop.call_later(max(self._deadline - time.monotonic(), 0), deadline_passed) if won else None
+                await asyncio.sleep(self.renew_interval)
+        finally:
+            if step_down is not None:
+                step_down.cancel()
+            for task in running:
+                task.cancel()
+            if acquiring is not None and not acquiring.done():
+                # otherwise the claim could be written after release() and outlive us
+                await asyncio.gather(acquiring, return_exceptions=True)
+            if leading or self.is_leader:
+                self.release()
@@ -4,58 +4,77 @@
 # ==========================
 
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import FastAPI, HTTPException, Depends, Query, APIRouter
+from fastapi import APIRouter, FastAPI, HTTPException, Depends, Query, Request, WebSocket, WebSocketDisconnect, Header
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Optional, List
+from collections import Counter, OrderedDict
 from datetime import datetime, timedelta
 from contextlib import asynccontextmanager
 import asyncio
+import calendar
+import heapq
 import random
+import threading
+import time
 from fastapi import BackgroundTasks
 from backend.email_utils import send_email_with_pdf
+from backend import profiling, ratelimit
+from backend.pubsub import broker, parse_flight_ids, sse_format
+from backend.inventory import inventory, FLIGHT_COLUMNS
+from backend.serialization import rows_response
+from backend.routing import city_key, route_index, pair_round_trips
+from backend.pricing import DEFAULT_PRICING, price_for
+from backend.simulation import churn_seats, random_demand
+from backend.idempotency import IdempotencyStore
+from backend.leader import LeaderLease
+from backend.sharding import DEFAULT_SHARD, ShardRouter, shard_urls
 from io import BytesIO
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from reportlab.platypus import Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-import qrcode
-import io, os
+import os
 
 # SQLAlchemy setup (sqlite)
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, DECIMAL, ForeignKey, func, desc
-from sqlalchemy.orm import sessionmaker, declarative_base, relationship
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import Column, Integer, String, Text, DateTime, DECIMAL, Float, ForeignKey, func
+from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
 
 
 DB_URL = "sqlite:///./flights.db"
-engine = create_engine(DB_URL, connect_args={"check_same_thread": False}, future=True)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+# Flights (with their bookings and fares) are partitioned across FLIGHTSIM_SHARDS
+# databases; with the default of 1 this is the single flights.db engine.
+shards = ShardRouter(shard_urls(DB_URL), sqlite_connect_args={"check_same_thread": False}, future=True)
+engine = shards.engines[DEFAULT_SHARD]
+SessionLocal = shards.session_factory(autoflush=False, autocommit=False)
 Base = declarative_base()
 
-# --- BACKGROUND SIMULATOR (same as before for Milestone 2) ---
-async def simulator_loop(interval_seconds: int = 60):
-    while True:
-        await asyncio.sleep(interval_seconds)
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    asyncio.create_task(simulator_loop(60))
+    init_db()
+    broker.bind(asyncio.get_running_loop())
+    db = SessionLocal()
+    try:
+        inventory.load(_inventory_rows(db))
+    finally:
+        db.close()
+    # Only the lease holder runs the simulator and reapers; every worker
+    # (leader included) reconciles its snapshot with the others' writes.
+    background = [
+        asyncio.create_task(leader.campaign(
+            leader_jobs=[lambda: simulator_loop(SIMULATOR_INTERVAL), lambda: idempotency_reaper_loop(3600)],
+        )),
+        asyncio.create_task(inventory_sync_loop(SIMULATOR_INTERVAL)),
+    ]
     yield
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
 
 app = FastAPI(title="Flight Booking Simulator", lifespan=lifespan)
 
+# Opt-in request/worker profiling (no-op unless FLIGHTSIM_PROFILING=1)
+profiling.install(app)
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:5173", "http://127.0.0.1:5173"],  # Vite default
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Per-client token buckets + load shedding for writes/expensive endpoints
+ratelimit.install(app)
 
 
 # ==========================
@@ -108,7 +127,49 @@ class FareHistory(Base):
     recorded_at = Column(DateTime, default=func.now())
     price = Column(DECIMAL(10,2))
 
-Base.metadata.create_all(bind=engine)
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    key = Column(String, primary_key=True)  # "<scope>:<Idempotency-Key header>"
+    request_hash = Column(String, nullable=False)
+    status_code = Column(Integer)  # NULL while the original request is still running
+    response_body = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class Lease(Base):
+    __tablename__ = "leases"
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=False)  # "<host>:<pid>:<random>" of the worker holding it
+    expires_at = Column(Float, nullable=False)  # unix time
+
+
+def init_db():
+    """
+    Create missing tables, then any indexes missing from existing tables
+    (create_all() skips tables that already exist, so indexes added to a
+    model later would never reach an older flights.db). Runs once from
+    `lifespan` and from seed_data.py, never at import time. Workers
+    starting together can race on the same CREATE, so a failed attempt is
+    retried; the retry's existence check then skips what the winner made.
+    With several shards this runs on each of them, and airlines are
+    upserted from shard 0 (unchanged rows are not rewritten).
+    """
+    for attempt in range(3):
+        try:
+            shards.create_all(Base.metadata)
+            shards.replicate(Airline.__table__)
+            return
+        except OperationalError:
+            if attempt == 2:
+                raise
+            time.sleep(0.2)
+
+
+idempotency = IdempotencyStore(SessionLocal, IdempotencyKey)
+leader = LeaderLease(SessionLocal, Lease)
+SIMULATOR_INTERVAL = int(os.getenv("FLIGHTSIM_SIMULATOR_INTERVAL", "60"))
+ADMIN_ENABLED = os.getenv("FLIGHTSIM_ADMIN", "0") == "1"
 
 
 # ==========================
@@ -138,6 +199,23 @@ class FlightOut(BaseModel):
     class Config:
         from_attributes = True
 
+class ItineraryOut(BaseModel):
+    legs: List[FlightOut]
+    stops: int
+    total_price: float
+    duration_minutes: int
+    layover_minutes: List[int]
+
+class RoundTripOut(BaseModel):
+    outbound: ItineraryOut
+    inbound: ItineraryOut
+    total_price: float
+
+class ItinerarySearchOut(BaseModel):
+    outbound: List[ItineraryOut]
+    inbound: List[ItineraryOut] = []
+    round_trips: List[RoundTripOut] = []
+
 class BookingDetails(BaseModel):
     pnr: str
     flight_no: str
@@ -154,6 +232,11 @@ class BookingDetails(BaseModel):
     class Config:
         from_attributes = True
 
+BOOKING_SUMMARY_COLUMNS = (
+    "pnr", "flight_no", "passenger_name", "price_paid", "status",
+    "payment_status", "origin", "destination", "departure",
+)
+
 class BookingSummary(BaseModel):
     pnr: str
     flight_no: str
@@ -180,38 +263,104 @@ def get_db():
         db.close()
 
 
+# ==========================
+# ✅ In-memory flight snapshot (write-through)
+# ==========================
+_INVENTORY_COLUMNS = (
+    Flight.id, Flight.flight_no, Flight.airline_id, Airline.name, Airline.tier,
+    Flight.origin, Flight.destination, Flight.departure, Flight.arrival,
+    Flight.base_fare, Flight.total_seats, Flight.seats_available,
+)
+
+def _inventory_rows(db, flight_id: Optional[int] = None):
+    q = db.query(*_INVENTORY_COLUMNS).outerjoin(Airline, Airline.id == Flight.airline_id)
+    if flight_id is not None:
+        q = q.filter(Flight.id == flight_id)
+    return [tuple(r) for r in q]
+
+def get_flight_record(flight_id: int, db):
+    """Serve a flight from the snapshot, falling back to the DB for flights added behind our back"""
+    if not inventory.loaded:
+        inventory.load(_inventory_rows(db))
+    record = inventory.get(flight_id)
+    if record is None:
+        rows = _inventory_rows(db, flight_id)
+        if rows:
+            record = inventory.upsert(rows[0])
+    return record
+
+def _hydrate_rows(flight_ids, db) -> List[tuple]:
+    """Snapshot rows in FLIGHT_COLUMNS order (no per-row model construction)"""
+    out = []
+    for flight_id in flight_ids:
+        record = get_flight_record(flight_id, db)
+        if record:
+            out.append(record.as_row())
+    return out
+
+route_index.attach(inventory)
+
+def flight_changed(flight_id: int, seats_available: int, dynamic_price: Optional[float] = None):
+    """Call after committing a seat/fare change: updates the snapshot and notifies subscribers"""
+    inventory.set_seats(flight_id, seats_available)
+    record = inventory.get(flight_id)
+    if record is not None:
+        invalidate_fare_calendar(record.origin, record.destination)
+    broker.publish_flight(flight_id, seats_available=seats_available, dynamic_price=dynamic_price)
+
+
+# Opt-in operational status routes (not registered unless FLIGHTSIM_ADMIN=1)
+admin = APIRouter(prefix="/admin", tags=["admin"], route_class=app.router.route_class)
+
+
+@admin.get("/ratelimit")
+def ratelimit_status():
+    return ratelimit.stats()
+
+
+@admin.get("/leader")
+def leader_status():
+    return {"worker": leader.holder, "is_leader": leader.is_leader, "changes": leader.changes, "lease": leader.current()}
+
+
+@admin.get("/inventory")
+def inventory_status(verify: bool = False, db=Depends(get_db)):
+    status = {"generation": inventory.generation, "flights": len(inventory), "loaded": inventory.loaded}
+    if verify:
+        status.update(inventory.verify(db.query(Flight.id, Flight.seats_available)))
+    return status
+
+
+if ADMIN_ENABLED:
+    app.include_router(admin)
+
+
 # ==========================
 # ✅ MILESTONE 2 EXISTING FLIGHT ENDPOINTS (UNCHANGED)
 # ==========================
 @app.get("/flights", response_model=List[FlightOut])
 def list_flights(
+    request: Request,
     sort_by: Optional[str] = Query(None, pattern="^(price|duration)$"),
     limit: int = 20,
     db=Depends(get_db)
 ):
-    q = db.query(Flight).join(Airline, isouter=True)
-    flights = q.limit(limit).all()
-    out = [
-        FlightOut(
-            id=f.id, flight_no=f.flight_no, origin=f.origin, destination=f.destination,
-            departure=f.departure, arrival=f.arrival, base_fare=float(f.base_fare),
-            seats_available=f.seats_available, total_seats=f.total_seats,
-            airline_name=f.airline.name if f.airline else None
-        )
-        for f in flights
-    ]
+    per_shard = shards.scatter(lambda s: s.query(Flight.id).order_by(Flight.id).limit(limit).all())
+    flight_ids = sorted(fid for ids in per_shard for (fid,) in ids)[:limit]
+    rows = _hydrate_rows(flight_ids, db)
 
     if sort_by == "duration":
-        out.sort(key=lambda x: (x.arrival - x.departure).total_seconds())
+        rows.sort(key=lambda r: (r[5] - r[4]).total_seconds())  # arrival - departure
     elif sort_by == "price":
-        out.sort(key=lambda x: x.base_fare)
-    return out
+        rows.sort(key=lambda r: r[6])  # base_fare
+    return rows_response(request, FLIGHT_COLUMNS, rows)
 
 # ==========================
 # ✅ NEW MILESTONE 4 ENDPOINT: /search (for frontend integration)
 # ==========================
 @app.get("/search", response_model=List[FlightOut])
 def search_flights(
+    request: Request,
     origin: Optional[str] = Query(None),
     destination: Optional[str] = Query(None),
     date: Optional[str] = Query(None),  # format: YYYY-MM-DD
@@ -223,112 +372,222 @@ def search_flights(
     - If user enters origin/destination/date, filters accordingly.
     - If user leaves all blank → returns next 20 upcoming flights (soonest departures).
     """
-    query = db.query(Flight).join(Airline, isouter=True)
-
-    # Filters only when user provides them
-    if origin:
-        query = query.filter(Flight.origin.ilike(f"%{origin}%"))
-    if destination:
-        query = query.filter(Flight.destination.ilike(f"%{destination}%"))
+    search_date = None
     if date:
         try:
             search_date = datetime.fromisoformat(date).date()
-            query = query.filter(func.date(Flight.departure) == search_date)
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
 
     # 🕒 Show only upcoming flights (departure after 'now')
     now = datetime.utcnow()
-    query = query.filter(Flight.departure > now)
 
-    # Default sort: earliest departure first
-    query = query.order_by(Flight.departure.asc()).limit(limit)
-    flights = query.all()
+    def upcoming(s):
+        query = s.query(Flight.departure, Flight.id)
 
-    # ✅ Convert to schema
-    return [
-        FlightOut(
-            id=f.id,
-            flight_no=f.flight_no,
-            origin=f.origin,
-            destination=f.destination,
-            departure=f.departure,
-            arrival=f.arrival,
-            base_fare=float(f.base_fare),
-            seats_available=f.seats_available,
-            total_seats=f.total_seats,
-            airline_name=f.airline.name if f.airline else None
-        )
-        for f in flights
-    ]
+        # Filters only when user provides them
+        if origin:
+            query = query.filter(Flight.origin.ilike(f"%{origin}%"))
+        if destination:
+            query = query.filter(Flight.destination.ilike(f"%{destination}%"))
+        if search_date:
+            query = query.filter(func.date(Flight.departure) == search_date)
+
+        # Default sort: earliest departure first
+        return query.filter(Flight.departure > now).order_by(Flight.departure.asc()).limit(limit).all()
 
+    # Each shard returns its earliest `limit`; merge them by departure
+    merged = heapq.merge(*shards.scatter(upcoming), key=lambda r: r[0])
+    flight_ids = [fid for _, (_, fid) in zip(range(limit), merged)]
 
-# Dynamic pricing function
-def calculate_dynamic_price(base_fare: float, seats_available: int, total_seats: int, departure: datetime, demand_index: float, airline_tier: str) -> float:
-    # seat factor: fewer seats => higher multiplier
-    seat_pct = seats_available / total_seats if total_seats else 0
-    seat_factor = (1 - seat_pct) * 0.6  # up to +60%
+    # ✅ Hydrate from the in-memory snapshot
+    return rows_response(request, FLIGHT_COLUMNS, _hydrate_rows(flight_ids, db))
+
+
+# ==========================
+# ✅ Multi-leg itinerary search (1- and 2-stop, round trip)
+# ==========================
+def _itinerary_out(it) -> ItineraryOut:
+    return ItineraryOut(
+        legs=[FlightOut(**leg.as_dict()) for leg in it.legs],
+        stops=it.stops,
+        total_price=it.total_price,
+        duration_minutes=it.duration_minutes,
+        layover_minutes=it.layover_minutes,
+    )
+
+def _day_window(date: Optional[str], now: datetime):
+    if not date:
+        return now, now + timedelta(days=1)
+    try:
+        start = datetime.fromisoformat(date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+    start = datetime.combine(start.date(), datetime.min.time())
+    return max(start, now), start + timedelta(days=1)
+
+@app.get("/search/itineraries", response_model=ItinerarySearchOut)
+def search_itineraries(
+    origin: str = Query(..., min_length=2),
+    destination: str = Query(..., min_length=2),
+    date: Optional[str] = Query(None),  # format: YYYY-MM-DD, default: next 24h
+    return_date: Optional[str] = Query(None),  # enables round-trip mode
+    max_stops: int = Query(2, ge=0, le=2),
+    min_layover: int = Query(45, ge=0, description="minutes"),
+    max_layover: int = Query(360, ge=1, description="minutes"),
+    sort_by: str = Query("price", pattern="^(price|duration)$"),
+    limit: int = Query(20, ge=1, le=100),
+    db=Depends(get_db)
+):
+    """
+    Direct, 1-stop and 2-stop itineraries from the in-memory route index.
+    Ranked by total dynamic price (neutral demand) or total duration.
+    """
+    if min_layover > max_layover:
+        raise HTTPException(status_code=400, detail="min_layover must not exceed max_layover")
+    if not inventory.loaded:
+        inventory.load(_inventory_rows(db))
 
-    # time factor: closer to departure => higher multiplier
     now = datetime.utcnow()
-    hours_until = max((departure - now).total_seconds() / 3600, 0.0)
-    if hours_until > 72:
-        time_factor = 0.0
-    elif hours_until > 24:
-        time_factor = 0.05
-    elif hours_until > 6:
-        time_factor = 0.15
-    else:
-        time_factor = 0.35
+    opts = dict(price_fn=quote_price, max_stops=max_stops, min_layover=timedelta(minutes=min_layover),
+                max_layover=timedelta(minutes=max_layover), sort_by=sort_by, limit=limit)
+    outbound = route_index.search(origin, destination, *_day_window(date, now), **opts)
+    result = ItinerarySearchOut(outbound=[_itinerary_out(it) for it in outbound])
+
+    if return_date:
+        inbound = route_index.search(destination, origin, *_day_window(return_date, now), **opts)
+        result.inbound = [_itinerary_out(it) for it in inbound]
+        result.round_trips = [
+            RoundTripOut(outbound=_itinerary_out(out), inbound=_itinerary_out(back),
+                         total_price=round(out.total_price + back.total_price, 2))
+            for out, back in pair_round_trips(outbound, inbound, timedelta(minutes=min_layover), sort_by, limit)
+        ]
+    return result
 
-    # demand factor: simulated demand index [0.0, 1.0]
-    demand_factor = (demand_index - 0.5) * 0.5  # [-0.25, +0.25]
 
-    # tier factor
-    tier_map = {"budget": -0.05, "standard": 0.0, "premium": 0.08}
-    tier_factor = tier_map.get(airline_tier, 0.0)
+# Dynamic pricing function (factors live in backend.pricing.PricingParams)
+def calculate_dynamic_price(base_fare: float, seats_available: int, total_seats: int, departure: datetime, demand_index: float, airline_tier: str, now: Optional[datetime] = None) -> float:
+    return price_for(DEFAULT_PRICING, base_fare, seats_available, total_seats, departure, demand_index, airline_tier, now)
 
-    multiplier = 1 + seat_factor + time_factor + demand_factor + tier_factor
+def quote_price(r) -> float:
+    """Dynamic price of a snapshot record at neutral demand (used for ranking/calendars)"""
+    return calculate_dynamic_price(r.base_fare, r.seats_available, r.total_seats, r.departure, 0.5, r.airline_tier)
 
-    # clamp multiplier to reasonable bounds
-    multiplier = max(0.6, min(multiplier, 3.0))
 
-    return round(base_fare * multiplier, 2)
+# ==========================
+# ✅ Flexible-date fare calendar
+# ==========================
+FARE_CALENDAR_TTL = 300  # seconds; the time-to-departure factor drifts even without writes
+FARE_CALENDAR_MAX_ENTRIES = 1024
+_fare_calendar_cache = OrderedDict()  # (origin, destination, month) -> (expires_at, days), least recently used first
+_fare_calendar_lock = threading.Lock()
+
+def _route_key(origin: str, destination: str):
+    return city_key(origin), city_key(destination)
+
+def invalidate_fare_calendar(origin: str, destination: str):
+    route = _route_key(origin, destination)
+    with _fare_calendar_lock:
+        for key in [k for k in _fare_calendar_cache if k[:2] == route]:
+            del _fare_calendar_cache[key]
+
+def _cached_fare_calendar(key):
+    with _fare_calendar_lock:
+        cached = _fare_calendar_cache.get(key)
+        if cached is None:
+            return None
+        if cached[0] <= time.monotonic():
+            del _fare_calendar_cache[key]
+            return None
+        _fare_calendar_cache.move_to_end(key)
+        return cached[1]
+
+def _store_fare_calendar(key, days):
+    with _fare_calendar_lock:
+        _fare_calendar_cache[key] = (time.monotonic() + FARE_CALENDAR_TTL, days)
+        _fare_calendar_cache.move_to_end(key)
+        while len(_fare_calendar_cache) > FARE_CALENDAR_MAX_ENTRIES:
+            _fare_calendar_cache.popitem(last=False)
+
+@app.get("/fare_calendar")
+def fare_calendar(
+    origin: str = Query(..., min_length=2),
+    destination: str = Query(..., min_length=2),
+    month: str = Query(..., pattern=r"^\d{4}-\d{2}$"),  # format: YYYY-MM
+    db=Depends(get_db)
+):
+    """Cheapest current fare and number of bookable flights for every day of a month"""
+    try:
+        year, mon = map(int, month.split("-"))
+        first_day = datetime(year, mon, 1)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid month format. Use YYYY-MM")
+
+    route = _route_key(origin, destination)
+    cache_key = route + (first_day.strftime("%Y-%m"),)
+    cached = _cached_fare_calendar(cache_key)
+    if cached is not None:
+        return {"origin": origin, "destination": destination, "month": month, "days": cached}
+
+    days_in_month = calendar.monthrange(year, mon)[1]
+    now = datetime.utcnow()
+
+    # One grouped query: flight ids per departure day for this route/month
+    day = func.date(Flight.departure)
+    per_shard = shards.scatter(lambda s: (
+        s.query(day.label("day"), func.group_concat(Flight.id).label("ids"))
+        .filter(func.lower(func.trim(Flight.origin)) == route[0], func.lower(func.trim(Flight.destination)) == route[1])
+        .filter(Flight.departure >= max(first_day, now))
+        .filter(Flight.departure < first_day + timedelta(days=days_in_month))
+        .filter(Flight.seats_available > 0)
+        .group_by(day)
+        .all()
+    ))
+    ids_by_day = {}
+    for grouped in per_shard:
+        for r in grouped:
+            ids_by_day.setdefault(str(r.day), []).extend(int(i) for i in r.ids.split(","))
+
+    # Batch pricing from the in-memory snapshot
+    days = []
+    for d in range(1, days_in_month + 1):
+        key = f"{month}-{d:02d}"
+        prices = [quote_price(rec) for rec in (get_flight_record(fid, db) for fid in ids_by_day.get(key, ())) if rec]
+        days.append({"date": key, "lowest_price": min(prices) if prices else None, "flights": len(prices)})
+
+    _store_fare_calendar(cache_key, days)
+    return {"origin": origin, "destination": destination, "month": month, "days": days}
+
+
+FARE_HISTORY_MIN_INTERVAL = 30  # seconds
+_fare_recorded_at = {}  # flight_id -> monotonic time of the last FareHistory insert
 
 @app.get("/dynamic_price/{flight_id}")
 def dynamic_price(flight_id: int, db=Depends(get_db)):
-    f = db.query(Flight).filter(Flight.id == flight_id).first()
+    f = get_flight_record(flight_id, db)
     if not f:
         raise HTTPException(status_code=404, detail="Flight not found")
     # Simulated demand index - in real app this would come from analytics/service
     demand_index = random.uniform(0.2, 0.9)
 
-    airline_tier = f.airline.tier if f.airline else "standard"
     price = calculate_dynamic_price(
-        float(f.base_fare), f.seats_available, f.total_seats, f.departure, demand_index, airline_tier
+        f.base_fare, f.seats_available, f.total_seats, f.departure, demand_index, f.airline_tier
     )
-    # optionally persist fare history
-    fh = FareHistory(flight_id=f.id, price=price)
-    db.add(fh); db.commit()
-    return {"flight_id": f.id, "dynamic_price": price, "base_fare": float(f.base_fare), "seats_available": f.seats_available, "demand_index": round(demand_index,2)}
-
-# Booking endpoint (transaction-safe)
-class Passenger(BaseModel):
-    passenger_name: str = Field(..., min_length=3)
-    passenger_phone: Optional[str]
-
-class BookingRequest(BaseModel):
-    flight_id: int
-    passenger: Passenger
-    seat_no: Optional[int] = None
+    # optionally persist fare history (at most once per flight per interval, so polling can't flood the writer)
+    now = time.monotonic()
+    if now - _fare_recorded_at.get(f.id, float("-inf")) >= FARE_HISTORY_MIN_INTERVAL:
+        _fare_recorded_at[f.id] = now
+        fh = FareHistory(flight_id=f.id, price=price)
+        db.add(fh); db.commit()
+    return {"flight_id": f.id, "dynamic_price": price, "base_fare": f.base_fare, "seats_available": f.seats_available, "demand_index": round(demand_index,2)}
 
 @app.get("/seat_price/{flight_id}")
 def get_seat_price(flight_id: int, seat_no: str, db=Depends(get_db)):
-    flight = db.query(Flight).filter(Flight.id == flight_id).first()
+    flight = get_flight_record(flight_id, db)
     if not flight:
         raise HTTPException(status_code=404, detail="Flight not found")
 
-    base_price = float(flight.base_fare)
+    base_price = flight.base_fare
 
     # Determine seat type
     col = seat_no[0].upper()
@@ -364,7 +623,12 @@ def get_seat_price(flight_id: int, seat_no: str, db=Depends(get_db)):
 # ==========================
 
 @app.post("/booking/initiate")
-def initiate_booking(req: BookingRequest, db=Depends(get_db)):
+async def initiate_booking(req: BookingRequest, db=Depends(get_db),
+                           idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")):
+    handler = profiling.handler_call(lambda: _initiate_booking(req, db))  # runs in the threadpool
+    return await idempotency.run("booking/initiate", idempotency_key, req, handler)
+
+def _initiate_booking(req: BookingRequest, db):
     try:
         flight = db.query(Flight).with_for_update().filter(Flight.id == req.flight_id).first()
         if not flight:
@@ -373,14 +637,16 @@ def initiate_booking(req: BookingRequest, db=Depends(get_db)):
             raise HTTPException(status_code=400, detail="No seats available")
 
         demand_index = random.uniform(0.2, 0.9)
-        airline_tier = flight.airline.tier if flight.airline else "standard"
+        record = get_flight_record(flight.id, db)
+        airline_tier = record.airline_tier if record else "standard"
         price = calculate_dynamic_price(
             float(flight.base_fare), flight.seats_available,
             flight.total_seats, flight.departure, demand_index, airline_tier
         )
 
         flight.seats_available -= 1
-        pnr = f"PNR{random.randint(100000, 999999)}"
+        seats_left = flight.seats_available
+        pnr = shards.new_pnr(flight.id)  # PNR number maps to the flight's shard
 
         booking = Booking(
             pnr=pnr,
@@ -395,6 +661,9 @@ def initiate_booking(req: BookingRequest, db=Depends(get_db)):
 
         db.add(booking)
         db.commit()
+
+        flight_changed(flight.id, seats_left, dynamic_price=price)
+        broker.publish_dashboard(bookings=1, revenue=price, passengers=1, trend_day=datetime.utcnow().strftime("%a"))
         return {"message": "Booking initiated", "pnr": pnr, "price": price, "status": "INITIATED", "payment_status": "PENDING"}
     except SQLAlchemyError as e:
         db.rollback()
@@ -403,13 +672,16 @@ def initiate_booking(req: BookingRequest, db=Depends(get_db)):
 # ==========================
 # ✅ NEW MILESTONE 3 ENDPOINT: /booking/pay/{pnr}
 # ==========================
-from pydantic import BaseModel
-
 class PaymentRequest(BaseModel):
     success: bool
 
 @app.post("/booking/pay/{pnr}")
-def process_payment(pnr: str, req: PaymentRequest, db=Depends(get_db)):
+async def process_payment(pnr: str, req: PaymentRequest, db=Depends(get_db),
+                          idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")):
+    handler = profiling.handler_call(lambda: _process_payment(pnr, req, db))  # runs in the threadpool
+    return await idempotency.run(f"booking/pay/{pnr}", idempotency_key, req, handler)
+
+def _process_payment(pnr: str, req: PaymentRequest, db):
     booking = db.query(Booking).filter(Booking.pnr == pnr).first()
 
     if not booking:
@@ -436,7 +708,12 @@ def process_payment(pnr: str, req: PaymentRequest, db=Depends(get_db)):
     }
 
 @app.post("/booking/cancel/{pnr}")
-def cancel_booking(pnr: str, db=Depends(get_db)):
+async def cancel_booking(pnr: str, db=Depends(get_db),
+                         idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")):
+    handler = profiling.handler_call(lambda: _cancel_booking(pnr, db))  # runs in the threadpool
+    return await idempotency.run(f"booking/cancel/{pnr}", idempotency_key, {}, handler)
+
+def _cancel_booking(pnr: str, db):
     booking = db.query(Booking).filter(Booking.pnr == pnr).first()
 
     if not booking:
@@ -453,6 +730,8 @@ def cancel_booking(pnr: str, db=Depends(get_db)):
     booking.status = "CANCELLED"
     
     db.commit()
+    if flight:
+        flight_changed(flight.id, flight.seats_available)
 
     return {
         "message": "Booking cancelled",
@@ -487,12 +766,19 @@ def get_booking_details(pnr: str, db=Depends(get_db)):
 
 @app.get("/bookings", response_model=List[BookingSummary])
 def get_all_bookings(
+    request: Request,
     passenger_phone: Optional[str] = None,
     status: Optional[str] = None,
     payment_status: Optional[str] = None,
     db=Depends(get_db)
 ):
-    query = db.query(Booking)
+    query = (
+        db.query(
+            Booking.pnr, Flight.flight_no, Booking.passenger_name, Booking.price_paid,
+            Booking.status, Booking.payment_status, Flight.origin, Flight.destination, Flight.departure,
+        )
+        .join(Flight, Flight.id == Booking.flight_id)
+    )
 
     if passenger_phone:
         query = query.filter(Booking.passenger_phone == passenger_phone)
@@ -503,63 +789,165 @@ def get_all_bookings(
     if payment_status:
         query = query.filter(Booking.payment_status == payment_status.upper())
 
-    bookings = query.all()
-
-    result = []
-    for b in bookings:
-        flight = db.query(Flight).filter(Flight.id == b.flight_id).first()
-        if flight:
-            result.append(
-                BookingSummary(
-                    pnr=b.pnr,
-                    flight_no=flight.flight_no,
-                    passenger_name=b.passenger_name,
-                    price_paid=float(b.price_paid),
-                    status=b.status,
-                    payment_status=b.payment_status,
-                    origin=flight.origin,
-                    destination=flight.destination,
-                    departure=flight.departure
-                )
-            )
+    # One joined query, rows passed straight to the encoder
+    rows = [(pnr, flight_no, name, float(price or 0), st, pay, o, d, dep)
+            for pnr, flight_no, name, price, st, pay, o, d, dep in query]
+    return rows_response(request, BOOKING_SUMMARY_COLUMNS, rows)
 
-    return result
+
+## background simulator (wall-clock; see backend/simulation.py for the accelerated engine)
+def simulator_tick():
+    """One churn/reprice pass over every flight; returns the committed changes, or None if leadership was lost"""
+    db = SessionLocal()
+    try:
+        flights = db.query(Flight).all()
+        changed = []
+        for f in flights:
+            new_avail = churn_seats(f.seats_available, f.total_seats)  # small churn
+            if new_avail != f.seats_available:
+                f.seats_available = new_avail
+                demand_index = random_demand()
+                record = inventory.get(f.id)
+                tier = record.airline_tier if record else "standard"
+                price = calculate_dynamic_price(
+                    float(f.base_fare), f.seats_available, f.total_seats,
+                    f.departure, demand_index, tier
+                )
+                db.add(FareHistory(flight_id=f.id, price=price))
+                changed.append((f.id, f.seats_available, price))
+        if not leader.is_leader:
+            db.rollback()
+            return None
+        db.commit()
+        return changed
+    except Exception:
+        db.rollback()
+        return None
+    finally:
+        db.close()
 
 
-## background simulator
 async def simulator_loop(interval_seconds: int = 60):
     while True:
+        if leader.is_leader:  # skip the write tick if the lease was lost since this job started
+            # the DB work runs off the event loop; notifications go out from it
+            changed = await asyncio.to_thread(simulator_tick)
+            for flight_id, seats, price in changed or ():
+                flight_changed(flight_id, seats, dynamic_price=price)
+        await asyncio.sleep(interval_seconds)
+
+
+async def inventory_sync_loop(interval_seconds: int = 60):
+    """Reconcile this worker's snapshot with the flights table (other workers' writes, re-seeds, deletes)"""
+    def reconcile():
+        db = SessionLocal()
         try:
-            db = SessionLocal()
-            flights = db.query(Flight).all()
-            for f in flights:
-                change = random.choice([-2, -1, 0, 0, 1])  # small churn
-                new_avail = max(0, min(f.total_seats, f.seats_available + change))
-                if new_avail != f.seats_available:
-                    f.seats_available = new_avail
-                    demand_index = random.uniform(0.2, 0.9)
-                    tier = f.airline.tier if f.airline else "standard"
-                    price = calculate_dynamic_price(
-                        float(f.base_fare), f.seats_available, f.total_seats,
-                        f.departure, demand_index, tier
-                    )
-                    db.add(FareHistory(flight_id=f.id, price=price))
-            db.commit()
-        except Exception:
-            db.rollback()
+            since = inventory.generation  # before the read: later write-throughs are newer than the rows
+            return inventory.reconcile(_inventory_rows(db), since)
         finally:
             db.close()
+
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            changes = await asyncio.to_thread(reconcile)
+        except SQLAlchemyError:
+            continue
+        for flight_id, seats in changes["seats"]:
+            flight_changed(flight_id, seats)
+        for old, new in changes["replaced"]:
+            for record in filter(None, (old, new)):
+                invalidate_fare_calendar(record.origin, record.destination)
+            broker.publish_flight(new.id, seats_available=new.seats_available)
+        for record in changes["removed"]:
+            invalidate_fare_calendar(record.origin, record.destination)
+
+
+async def idempotency_reaper_loop(interval_seconds: int = 3600):
+    """Drop idempotency keys past their TTL"""
+    while True:
+        try:
+            await asyncio.to_thread(idempotency.purge_expired)
+        except SQLAlchemyError:
+            pass
         await asyncio.sleep(interval_seconds)
 
 
 
 
+# ==========================
+# ✅ LIVE UPDATES (SSE / WebSocket)
+# ==========================
+def _subscription_args(flights: Optional[str]):
+    try:
+        return parse_flight_ids(flights)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="flights must be a comma-separated list of ids")
+
+
+async def _sse_stream(request: Request, sub):
+    try:
+        while not await request.is_disconnected():
+            yield sse_format(await sub.next_batch())
+    finally:
+        sub.close()
+
+
+@app.get("/stream/prices")
+async def stream_prices(request: Request, flights: Optional[str] = Query(None)):
+    """SSE feed of price/seat deltas for the given flight ids (all flights if omitted)"""
+    sub = broker.subscribe(_subscription_args(flights))
+    return StreamingResponse(_sse_stream(request, sub), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.get("/stream/dashboard")
+async def stream_dashboard(request: Request):
+    """SSE feed of dashboard stat deltas (bookings, revenue, passengers, weekday trend)"""
+    sub = broker.subscribe(flight_ids=(), dashboard=True)  # no flight deltas
+    return StreamingResponse(_sse_stream(request, sub), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.websocket("/ws/live")
+async def live_updates(ws: WebSocket):
+    """
+    WebSocket variant of the SSE feeds. Clients send
+    {"flights": [1, 2] | "*", "dashboard": true} at any time to (re)subscribe.
+    """
+    await ws.accept()
+    sub = broker.subscribe(flight_ids=())
+
+    async def read_commands():
+        while True:
+            msg = await ws.receive_json()
+            if "flights" in msg:
+                ids = msg["flights"]
+                sub.update(flight_ids=None if ids == "*" else [int(i) for i in ids or []])
+            if "dashboard" in msg:
+                sub.update(dashboard=msg["dashboard"])
+
+    reader = asyncio.create_task(read_commands())
+    try:
+        while not reader.done():
+            batch = await sub.next_batch(timeout=1.0)
+            if batch:
+                await ws.send_json(batch)
+        reader.result()
+    except (WebSocketDisconnect, RuntimeError, ValueError, TypeError):
+        pass
+    finally:
+        reader.cancel()
+        sub.close()
+
+
 # ==========================
 # ✅ MILESTONE 4 EXTENSIONS
 # ==========================
 
 
-# Allow frontend to call backend
+# Allow frontend to call backend. Added after the profiling and rate-limit
+# middleware so it is the outermost layer and 429/503 responses carry CORS headers.
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Allow all for now
@@ -569,57 +957,20 @@ app.add_middleware(
 )
 
 
-@app.get("/bookings")
-def get_all_bookings_with_flight(db=Depends(get_db)):
-    """Return all bookings with flight info"""
-    bookings = (
-        db.query(Booking, Flight)
-        .join(Flight, Flight.id == Booking.flight_id)
-        .all()
-    )
-    results = []
-    for b, f in bookings:
-        results.append({
-            "pnr": b.pnr,
-            "status": b.status,
-            "payment_status": b.payment_status,
-            "price_paid": float(b.price_paid) if b.price_paid else 0,
-            "passenger_name": b.passenger_name,
-            "passenger_phone": b.passenger_phone,
-            "flight_no": f.flight_no,
-            "origin": f.origin,
-            "destination": f.destination,
-            "departure": f.departure,
-            "arrival": f.arrival,
-        })
-    return results
-
-
-@app.post("/booking/cancel/{pnr}")
-def cancel_booking(pnr: str, db=Depends(get_db)):
-    """Cancel booking if it exists and is not already cancelled"""
-    booking = db.query(Booking).filter(Booking.pnr == pnr).first()
-    if not booking:
-        raise HTTPException(status_code=404, detail="Booking not found")
-    if booking.status == "CANCELLED":
-        return {"message": "Booking already cancelled"}
-
-    booking.status = "CANCELLED"
-    db.commit()
-    return {"message": f"Booking {pnr} cancelled successfully", "status": "CANCELLED"}
-
-
-
 # ==========================
 # ✅ DASHBOARD ANALYTICS ENDPOINTS (FINAL + FIXED)
 # ==========================
 
 @app.get("/dashboard/stats")
 def get_dashboard_stats(db=Depends(get_db)):
-    total_flights = db.query(func.count(Flight.id)).scalar() or 0
-    total_bookings = db.query(func.count(Booking.id)).scalar() or 0
-    total_revenue = db.query(func.sum(Booking.price_paid)).scalar() or 0
-    total_passengers = db.query(func.count(Booking.passenger_name)).scalar() or 0
+    def totals(s):
+        return (
+            s.query(func.count(Flight.id)).scalar() or 0,
+            s.query(func.count(Booking.id)).scalar() or 0,
+            s.query(func.sum(Booking.price_paid)).scalar() or 0,
+            s.query(func.count(Booking.passenger_name)).scalar() or 0,
+        )
+    total_flights, total_bookings, total_revenue, total_passengers = (sum(col) for col in zip(*shards.scatter(totals)))
 
     return {
         "flights": total_flights,
@@ -631,42 +982,47 @@ def get_dashboard_stats(db=Depends(get_db)):
 
 @app.get("/dashboard/bookings_trend")
 def get_booking_trend(db=Depends(get_db)):
-    result = (
-        db.query(
+    counts = Counter()
+    for result in shards.scatter(lambda s: (
+        s.query(
             func.strftime("%w", Booking.created_at).label("day"),
             func.count(Booking.id)
         )
         .group_by("day")
         .all()
-    )
+    )):
+        for day, count in result:
+            counts[day] += count
     days = ["Sun", "Mon", "Tue", "Wed", "Thu", "Fri", "Sat"]
-    trend = [{"name": days[int(day)], "bookings": count} for day, count in result]
+    trend = [{"name": days[int(day)], "bookings": count} for day, count in sorted(counts.items())]
     return trend
 
 
 @app.get("/dashboard/top_routes")
 def get_top_routes(db=Depends(get_db)):
     """Returns top 5 most booked routes (origin → destination)"""
-    result = (
-        db.query(
+    counts = Counter()
+    for result in shards.scatter(lambda s: (
+        s.query(
             Flight.origin,
             Flight.destination,
             func.count(Booking.id).label("bookings")
         )
         .join(Booking, Booking.flight_id == Flight.id)
         .group_by(Flight.origin, Flight.destination)
-        .order_by(desc("bookings"))
-        .limit(5)
         .all()
-    )
-    return [{"route": f"{r.origin} → {r.destination}", "bookings": r.bookings} for r in result]
+    )):
+        for r in result:
+            counts[(r.origin, r.destination)] += r.bookings
+    return [{"route": f"{origin} → {destination}", "bookings": n} for (origin, destination), n in counts.most_common(5)]
 
 
 @app.get("/dashboard/airline_stats")
 def get_airline_stats(db=Depends(get_db)):
     """Returns booking and revenue summary per airline"""
-    result = (
-        db.query(
+    stats = {}
+    for result in shards.scatter(lambda s: (
+        s.query(
             Airline.name.label("airline"),
             func.count(Booking.id).label("bookings"),
             func.sum(Booking.price_paid).label("revenue"),
@@ -674,42 +1030,42 @@ def get_airline_stats(db=Depends(get_db)):
         .join(Flight, Flight.airline_id == Airline.id)
         .join(Booking, Booking.flight_id == Flight.id)
         .group_by(Airline.name)
-        .order_by(desc("bookings"))
         .all()
-    )
+    )):
+        for r in result:
+            bookings, revenue = stats.get(r.airline, (0, 0.0))
+            stats[r.airline] = (bookings + r.bookings, revenue + float(r.revenue or 0))
     return [
-        {"airline": r.airline, "bookings": r.bookings, "revenue": float(r.revenue or 0)}
-        for r in result
+        {"airline": airline, "bookings": bookings, "revenue": revenue}
+        for airline, (bookings, revenue) in sorted(stats.items(), key=lambda kv: kv[1][0], reverse=True)
     ]
 
 
 @app.get("/dashboard/fare_trend")
 def get_fare_trend(db=Depends(get_db)):
     """Shows average fare over time"""
-    result = (
-        db.query(
+    # sums and counts per shard, so the average is weighted correctly across shards
+    totals = {}
+    for result in shards.scatter(lambda s: (
+        s.query(
             func.date(FareHistory.recorded_at).label("date"),
-            func.avg(FareHistory.price).label("avg_price"),
+            func.sum(FareHistory.price).label("total"),
+            func.count(FareHistory.price).label("count"),
         )
         .group_by(func.date(FareHistory.recorded_at))
-        .order_by("date")
-        .limit(10)
         .all()
-    )
-    return [{"date": str(r.date), "avg_price": float(r.avg_price or 0)} for r in result]
+    )):
+        for r in result:
+            total, count = totals.get(r.date, (0.0, 0))
+            totals[r.date] = (total + float(r.total or 0), count + r.count)
+    return [
+        {"date": str(date), "avg_price": total / count if count else 0.0}
+        for date, (total, count) in sorted(totals.items(), key=lambda kv: str(kv[0]))[:10]
+    ]
 
 
 
 
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfbase import pdfmetrics
-import os
-
 @app.post("/email_ticket/{pnr}")
 async def email_ticket(pnr: str, background_tasks: BackgroundTasks, db=Depends(get_db)):
     booking = db.query(Booking).filter(Booking.pnr == pnr).first()
@@ -720,6 +1076,15 @@ async def email_ticket(pnr: str, background_tasks: BackgroundTasks, db=Depends(g
     if not flight:
         raise HTTPException(status_code=404, detail="Flight not found")
 
+    # ReportLab is only needed here, so it is imported on the first e-ticket
+    # instead of slowing down every worker start.
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfbase import pdfmetrics
+
     # ✅ Load font
     font_path = os.path.join(os.getcwd(), "backend", "fonts", "DejaVuSans.ttf")
     pdfmetrics.registerFont(TTFont("DejaVuSans", font_path))
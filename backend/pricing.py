@@ -0,0 +1,114 @@
+"""
+Dynamic pricing model.
+
+The factors used by `calculate_dynamic_price` live in `PricingParams` so
+alternative parameter sets can be evaluated offline (see backend.backtest)
+without touching the live endpoints. `DEFAULT_PRICING` reproduces the
+original hard-coded behaviour exactly.
+"""
+from dataclasses import dataclass, asdict, fields, replace
+from datetime import datetime
+from typing import Optional
+
+TIERS = ("budget", "standard", "premium")
+
+
+@dataclass(frozen=True)
+class PricingParams:
+    # seat factor: fewer seats => higher multiplier
+    seat_weight: float = 0.6  # up to +60%
+    # time factor: closer to departure => higher multiplier
+    far_hours: float = 72
+    mid_hours: float = 24
+    near_hours: float = 6
+    far_factor: float = 0.0
+    mid_factor: float = 0.05
+    near_factor: float = 0.15
+    last_minute_factor: float = 0.35
+    # demand factor: simulated demand index [0.0, 1.0]
+    demand_weight: float = 0.5  # [-0.25, +0.25]
+    # tier factor
+    budget_factor: float = -0.05
+    standard_factor: float = 0.0
+    premium_factor: float = 0.08
+    # clamp multiplier to reasonable bounds
+    min_multiplier: float = 0.6
+    max_multiplier: float = 3.0
+
+    def tier_factor(self, tier: str) -> float:
+        # unknown tiers price as standard, like airlines without a tier
+        return {"budget": self.budget_factor, "premium": self.premium_factor}.get(tier, self.standard_factor)
+
+    def time_factor(self, hours_until: float) -> float:
+        if hours_until > self.far_hours:
+            return self.far_factor
+        if hours_until > self.mid_hours:
+            return self.mid_factor
+        if hours_until > self.near_hours:
+            return self.near_factor
+        return self.last_minute_factor
+
+    def with_overrides(self, **overrides) -> "PricingParams":
+        return replace(self, **overrides)
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def field_names(cls):
+        return [f.name for f in fields(cls)]
+
+
+DEFAULT_PRICING = PricingParams()
+
+
+def multiplier(params: PricingParams, seat_pct: float, hours_until: float, demand_index: float, tier: str) -> float:
+    m = (1 + (1 - seat_pct) * params.seat_weight + params.time_factor(hours_until)
+         + (demand_index - 0.5) * params.demand_weight + params.tier_factor(tier))
+    return max(params.min_multiplier, min(m, params.max_multiplier))
+
+
+def price_for(params: PricingParams, base_fare: float, seats_available: int, total_seats: int,
+              departure: datetime, demand_index: float, airline_tier: str, now: Optional[datetime] = None) -> float:
+    seat_pct = seats_available / total_seats if total_seats else 0
+    now = now or datetime.utcnow()
+    hours_until = max((departure - now).total_seconds() / 3600, 0.0)
+    return round(base_fare * multiplier(params, seat_pct, hours_until, demand_index, airline_tier), 2)
+
+
+def implied_demand(params: PricingParams, observed_multiplier: float, seat_pct: float, hours_until: float, tier: str,
+                   bounded: bool = True) -> float:
+    """
+    Invert the model: the demand index that explains an observed price multiplier.
+    With bounded=False the index is not clamped to [0, 1], so whatever the
+    other factors miss is carried in it and repricing with `params` gives the
+    observed multiplier back.
+    """
+    if not params.demand_weight:
+        return 0.5
+    rest = 1 + (1 - seat_pct) * params.seat_weight + params.time_factor(hours_until) + params.tier_factor(tier)
+    demand = 0.5 + (observed_multiplier - rest) / params.demand_weight
+    return max(0.0, min(1.0, demand)) if bounded else demand
+
+
+def multiplier_matrix(param_sets, seat_pct, hours_until, demand_index, tier_idx):
+    """
+    Vectorized multipliers for S parameter sets x B events -> array (S, B).
+    Event inputs are 1-D numpy arrays; tier_idx indexes TIERS.
+    """
+    try:  # imported here so the API process never pays for numpy
+        import numpy as np
+    except ImportError:  # pragma: no cover
+        raise RuntimeError("numpy is required for vectorized pricing")
+
+    def col(name):
+        return np.array([getattr(p, name) for p in param_sets], dtype=np.float64)[:, None]
+
+    hours = hours_until[None, :]
+    time_factor = np.where(hours > col("far_hours"), col("far_factor"),
+                  np.where(hours > col("mid_hours"), col("mid_factor"),
+                  np.where(hours > col("near_hours"), col("near_factor"), col("last_minute_factor"))))
+    tier_table = np.hstack([col("budget_factor"), col("standard_factor"), col("premium_factor")])  # (S, 3)
+    m = (1 + (1 - seat_pct)[None, :] * col("seat_weight") + time_factor
+         + (demand_index - 0.5)[None, :] * col("demand_weight") + tier_table[:, tier_idx])
+    return np.clip(m, col("min_multiplier"), col("max_multiplier"))
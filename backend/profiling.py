@@ -0,0 +1,284 @@
+"""
+On-demand profiling for live requests.
+
+Everything here is opt-in: nothing is registered on the app unless
+FLIGHTSIM_PROFILING=1 is set at startup, so a normal deployment pays
+nothing for it.
+
+- Per-request: send `X-Profile: sample` (or `?profile=sample`) to run one
+  request under the stack sampler, or `X-Profile: cprofile` to run it under
+  cProfile. Both only cover the threads the handler runs on (the endpoint's
+  thread, plus any callable it hands to the threadpool through
+  `handler_call`), so concurrent requests do not leak into the profile;
+  an async endpoint's event-loop time still includes whatever else the loop
+  ran meanwhile. cProfile runs are serialized: a second one gets 409 while
+  another is in progress. The profile is kept in memory and its id is
+  returned in the `X-Profile-Id` response header; fetch it from
+  /admin/profiles/{id}.
+- Worker-wide: /admin/profile/sample?seconds=N samples every thread of the
+  worker (event loop, simulator task, threadpool) for N seconds and returns
+  collapsed stacks ready for flamegraph.pl / speedscope.
+"""
+import asyncio
+import contextlib
+import contextvars
+import cProfile
+import functools
+import inspect
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.routing import APIRoute
+
+PROFILING_ENABLED = os.getenv("FLIGHTSIM_PROFILING", "0") == "1"
+PROFILE_DIR = os.getenv("FLIGHTSIM_PROFILE_DIR")  # optional: also write profiles to disk
+MAX_STORED_PROFILES = 20
+MAX_SAMPLE_SECONDS = 60
+PROFILE_MODES = ("sample", "cprofile")
+
+# Set by the middleware for a profiled request; shared with the copied
+# context in the threadpool, so the handler's threads register with it.
+_request_profile = contextvars.ContextVar("flightsim_request_profile", default=None)
+_cprofile_lock = threading.Lock()  # one cProfile request at a time per worker
+
+
+class StackSampler:
+    """Samples the stacks of all threads at a fixed interval from a helper thread."""
+
+    def __init__(self, interval: float = 0.005, thread_ids=None):
+        self.interval = interval
+        self.thread_ids = thread_ids  # None => every thread except the sampler; may grow while running
+        self.samples = Counter()
+        self.sample_count = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _collapse(self, frame) -> str:
+        parts = []
+        while frame is not None:
+            code = frame.f_code
+            parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ";".join(reversed(parts))
+
+    def _run(self):
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.is_set():
+            for t in threading.enumerate():
+                names[t.ident] = t.name
+            for tid, frame in sys._current_frames().items():
+                if tid == own_id or (self.thread_ids is not None and tid not in self.thread_ids):
+                    continue
+                self.samples[f"{names.get(tid, tid)};{self._collapse(frame)}"] += 1
+            self.sample_count += 1
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="flightsim-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common())
+
+
+class ProfileStore:
+    """Small in-memory ring of recent profiles (optionally mirrored to PROFILE_DIR)."""
+
+    def __init__(self, maxlen: int = MAX_STORED_PROFILES):
+        self.maxlen = maxlen
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, label: str, kind: str, text: str) -> str:
+        profile_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._items[profile_id] = {"id": profile_id, "label": label, "kind": kind,
+                                       "created_at": time.time(), "text": text}
+            while len(self._items) > self.maxlen:
+                self._items.popitem(last=False)
+        if PROFILE_DIR:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            with open(os.path.join(PROFILE_DIR, f"{profile_id}.{kind}.txt"), "w", encoding="utf-8") as fh:
+                fh.write(f"# {label}\n{text}")
+        return profile_id
+
+    def get(self, profile_id: str):
+        with self._lock:
+            return self._items.get(profile_id)
+
+    def list(self):
+        with self._lock:
+            return [{k: v for k, v in p.items() if k != "text"} for p in self._items.values()]
+
+
+store = ProfileStore()
+
+
+class RequestProfile:
+    """Profiling state of one request, collected on every thread its handler runs on."""
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.threads = set()  # watched by the sampler
+        self.profilers = []  # cprofile: one per handler thread (a Profile is bound to its thread)
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def on_current_thread(self):
+        self.threads.add(threading.get_ident())
+        if self.mode != "cprofile":
+            yield
+            return
+        profiler = cProfile.Profile()
+        with self._lock:
+            self.profilers.append(profiler)
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+
+    def cprofile_text(self) -> str:
+        if not self.profilers:
+            return ""
+        out = io.StringIO()
+        stats = pstats.Stats(self.profilers[0], stream=out)
+        for profiler in self.profilers[1:]:
+            stats.add(profiler)
+        stats.sort_stats("cumulative").print_stats(60)
+        return out.getvalue()
+
+
+def handler_call(fn):
+    """
+    Wrap `fn`, which the current handler is about to run on another thread
+    (e.g. through run_in_threadpool), so a profiled request covers it too.
+    """
+    profile = _request_profile.get()
+    if profile is None:
+        return fn
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with profile.on_current_thread():
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def _tracked(endpoint):
+    """Wrap an endpoint so a profiled request covers the thread that runs it."""
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            profile = _request_profile.get()
+            if profile is None:
+                return await endpoint(*args, **kwargs)
+            with profile.on_current_thread():
+                return await endpoint(*args, **kwargs)
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            return handler_call(endpoint)(*args, **kwargs)
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, _tracked(endpoint), **kwargs)
+
+
+def _requested_mode(request):
+    """Returns the requested mode, None when not profiling, or "" for an unknown mode."""
+    mode = request.headers.get("x-profile") or request.query_params.get("profile")
+    if not mode:
+        return None
+    mode = mode.lower()
+    return mode if mode in PROFILE_MODES else ""
+
+
+async def profile_middleware(request, call_next):
+    mode = _requested_mode(request)
+    if mode is None:
+        return await call_next(request)
+    if not mode:
+        return JSONResponse(status_code=400, content={"detail": f"profile must be one of: {', '.join(PROFILE_MODES)}"})
+
+    if mode == "cprofile" and not _cprofile_lock.acquire(blocking=False):
+        return JSONResponse(status_code=409, content={"detail": "Another cprofile request is in progress"})
+
+    label = f"{request.method} {request.url.path}"
+    started = time.perf_counter()
+    profile = RequestProfile(mode)
+    token = _request_profile.set(profile)
+    sampler = StackSampler(interval=0.001, thread_ids=profile.threads).start() if mode == "sample" else None
+    try:
+        response = await call_next(request)
+    finally:
+        if sampler is not None:
+            sampler.stop()
+        _request_profile.reset(token)
+        if mode == "cprofile":
+            _cprofile_lock.release()
+    text = sampler.collapsed() if sampler is not None else profile.cprofile_text()
+
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+    profile_id = store.put(f"{label} ({elapsed_ms} ms)", mode, text)
+    response.headers["X-Profile-Id"] = profile_id
+    return response
+
+
+router = APIRouter(prefix="/admin", tags=["profiling"])
+
+
+@router.get("/profile/sample", response_class=PlainTextResponse)
+async def sample_worker(seconds: float = Query(5.0, gt=0, le=MAX_SAMPLE_SECONDS), interval_ms: float = Query(5.0, ge=1, le=1000)):
+    """Sample every thread in this worker for `seconds` and return collapsed stacks."""
+    sampler = StackSampler(interval=interval_ms / 1000).start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        sampler.stop()
+    text = sampler.collapsed()
+    store.put(f"worker sample ({seconds}s)", "sample", text)
+    return text
+
+
+@router.get("/profiles")
+def list_profiles():
+    return store.list()
+
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+def get_profile(profile_id: str):
+    profile = store.get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return f"# {profile['label']}\n{profile['text']}"
+
+
+def install(app):
+    """
+    Attach the profiling middleware and admin routes when FLIGHTSIM_PROFILING=1.
+    Must run before the app's routes are declared so they use ProfiledRoute.
+    """
+    if not PROFILING_ENABLED:
+        return
+    app.router.route_class = ProfiledRoute
+    app.middleware("http")(profile_middleware)
+    app.include_router(router)
@@ -0,0 +1,140 @@
+"""
+In-process pub/sub for price, seat and dashboard deltas.
+
+Writers (simulator_loop, booking, cancellation) publish a compact delta once
+and every connected SSE / WebSocket client gets it, so one DB change fans
+out to any number of clients without extra queries.
+
+Each subscriber keeps a coalescing mailbox instead of an unbounded queue:
+repeated updates for the same flight overwrite each other and dashboard
+deltas are summed, so a slow client only ever receives the latest state
+and can never make the publisher block or grow memory without bound.
+"""
+import asyncio
+import json
+import threading
+from typing import Iterable, Optional
+
+HEARTBEAT_SECONDS = 15
+_UNSET = object()
+
+
+class Subscription:
+    def __init__(self, broker: "PriceBroker", flight_ids: Optional[set], dashboard: bool):
+        self.broker = broker
+        self.flight_ids = flight_ids  # None => every flight, empty set => none
+        self.dashboard = dashboard
+        self._flights = {}
+        self._dashboard = None
+        self._event = asyncio.Event()
+
+    def wants_flight(self, flight_id: int) -> bool:
+        return self.flight_ids is None or flight_id in self.flight_ids
+
+    def update(self, flight_ids=_UNSET, dashboard=_UNSET):
+        if flight_ids is not _UNSET:
+            self.flight_ids = None if flight_ids is None else set(flight_ids)
+        if dashboard is not _UNSET:
+            self.dashboard = bool(dashboard)
+
+    def _push_flight(self, delta: dict):
+        current = self._flights.get(delta["flight_id"])
+        self._flights[delta["flight_id"]] = {**current, **delta} if current else delta
+        self._event.set()
+
+    def _push_dashboard(self, delta: dict):
+        if self._dashboard is None:
+            self._dashboard = {"bookings": 0, "revenue": 0.0, "passengers": 0, "trend": {}}
+        merged = self._dashboard
+        merged["bookings"] += delta.get("bookings", 0)
+        merged["revenue"] = round(merged["revenue"] + delta.get("revenue", 0.0), 2)
+        merged["passengers"] += delta.get("passengers", 0)
+        for day, count in delta.get("trend", {}).items():
+            merged["trend"][day] = merged["trend"].get(day, 0) + count
+        self._event.set()
+
+    async def next_batch(self, timeout: Optional[float] = HEARTBEAT_SECONDS):
+        """Wait for pending deltas; returns [] on timeout so callers can heartbeat."""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self._event.clear()
+        batch = [{"type": "flight", **d} for d in self._flights.values()]
+        if self._dashboard is not None:
+            batch.append({"type": "dashboard", **self._dashboard})
+        self._flights = {}
+        self._dashboard = None
+        return batch
+
+    def close(self):
+        self.broker._subs.discard(self)
+
+
+class PriceBroker:
+    """Fan-out hub bound to the server's event loop; publish() is safe from any thread."""
+
+    def __init__(self):
+        self._subs = set()
+        self._loop = None
+        self._loop_thread = None
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._loop_thread = threading.get_ident()
+
+    def subscribe(self, flight_ids: Optional[Iterable[int]] = None, dashboard: bool = False) -> Subscription:
+        sub = Subscription(self, None if flight_ids is None else set(flight_ids), dashboard)
+        self._subs.add(sub)
+        return sub
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subs)
+
+    def _dispatch(self, kind: str, delta: dict):
+        for sub in list(self._subs):
+            if kind == "flight":
+                if sub.wants_flight(delta["flight_id"]):
+                    sub._push_flight(delta)
+            elif sub.dashboard:
+                sub._push_dashboard(delta)
+
+    def _publish(self, kind: str, delta: dict):
+        # Cheap no-op when nobody is listening or the app is not serving yet.
+        if not self._subs or self._loop is None or self._loop.is_closed():
+            return
+        if threading.get_ident() == self._loop_thread:
+            self._dispatch(kind, delta)
+        else:
+            self._loop.call_soon_threadsafe(self._dispatch, kind, delta)
+
+    def publish_flight(self, flight_id: int, seats_available: Optional[int] = None, dynamic_price: Optional[float] = None):
+        delta = {"flight_id": flight_id}
+        if seats_available is not None:
+            delta["seats_available"] = seats_available
+        if dynamic_price is not None:
+            delta["dynamic_price"] = dynamic_price
+        self._publish("flight", delta)
+
+    def publish_dashboard(self, bookings: int = 0, revenue: float = 0.0, passengers: int = 0, trend_day: Optional[str] = None):
+        delta = {"bookings": bookings, "revenue": revenue, "passengers": passengers}
+        if trend_day:
+            delta["trend"] = {trend_day: bookings}
+        self._publish("dashboard", delta)
+
+
+broker = PriceBroker()
+
+
+def parse_flight_ids(raw: Optional[str]):
+    """Parse a `1,2,3` query value; empty means every flight. Raises ValueError."""
+    if not raw:
+        return None
+    return {int(x) for x in raw.split(",") if x.strip()} or None
+
+
+def sse_format(batch) -> str:
+    if not batch:
+        return ": keep-alive\n\n"
+    return "".join(f"event: {item['type']}\ndata: {json.dumps(item, separators=(',', ':'))}\n\n" for item in batch)
@@ -0,0 +1,159 @@
+"""
+Rate limiting and admission control.
+
+Two layers, both in-process and O(1) per request:
+
+1. Token buckets per (client, route class). Each route class has its own
+   refill rate and burst, shared by every endpoint in the class, so a
+   client's booking writes and its booking reads never draw from the same
+   bucket; a client that runs dry gets 429 with Retry-After.
+2. Concurrency limits per route class with load shedding. Booking writes
+   and expensive endpoints (PDF e-tickets, profiling) have a fixed
+   number of in-flight slots; when they are full the request is rejected
+   immediately with 503 + Retry-After instead of queueing behind the SQLite
+   writer. Cheap reads have no concurrency cap, so they keep flowing while
+   expensive work is being shed.
+
+The middleware runs on the event loop thread only, so no locking is needed.
+Set FLIGHTSIM_RATE_LIMITS=0 to disable it.
+"""
+import math
+import os
+import time
+from collections import OrderedDict
+
+from fastapi.responses import JSONResponse
+
+RATE_LIMITS_ENABLED = os.getenv("FLIGHTSIM_RATE_LIMITS", "1") != "0"
+TRUST_FORWARDED = os.getenv("FLIGHTSIM_TRUST_FORWARDED", "0") == "1"
+MAX_BUCKETS = 100_000
+
+# class -> (tokens per second, burst, max concurrent requests or None)
+ROUTE_CLASSES = {
+    "read": (20.0, 60, None),
+    "pricing": (5.0, 20, None),
+    "write": (2.0, 10, int(os.getenv("FLIGHTSIM_MAX_WRITES", "8"))),
+    "expensive": (0.2, 3, int(os.getenv("FLIGHTSIM_MAX_EXPENSIVE", "2"))),
+}
+
+EXPENSIVE_PREFIXES = ("/email_ticket", "/admin/profile")
+PRICING_PREFIXES = ("/dynamic_price", "/seat_price")
+EXEMPT_PREFIXES = ("/stream/", "/docs", "/openapi.json", "/redoc")
+
+
+def classify(method: str, path: str) -> str:
+    if path.startswith(EXPENSIVE_PREFIXES):
+        return "expensive"
+    if path.startswith(PRICING_PREFIXES):
+        return "pricing"
+    if method in ("POST", "PUT", "PATCH", "DELETE"):
+        return "write"
+    return "read"
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, burst: float, now: float):
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, rate: float, burst: float, now: float) -> float:
+        """Take one token; returns 0 on success or the seconds until one is available."""
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / rate
+
+
+class RateLimiter:
+    """LRU-bounded map of token buckets keyed by (client, route class)."""
+
+    def __init__(self, max_buckets: int = MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        self._buckets = OrderedDict()
+
+    def check(self, client: str, route_class: str, rate: float, burst: float) -> float:
+        now = time.monotonic()
+        key = (client, route_class)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(burst, now)
+            if len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.take(rate, burst, now)
+
+
+class AdmissionController:
+    """Non-blocking in-flight counters per route class."""
+
+    def __init__(self):
+        self.in_flight = {name: 0 for name in ROUTE_CLASSES}
+        self.shed = {name: 0 for name in ROUTE_CLASSES}
+
+    def try_acquire(self, route_class: str) -> bool:
+        limit = ROUTE_CLASSES[route_class][2]
+        if limit is not None and self.in_flight[route_class] >= limit:
+            self.shed[route_class] += 1
+            return False
+        self.in_flight[route_class] += 1
+        return True
+
+    def release(self, route_class: str):
+        self.in_flight[route_class] -= 1
+
+
+limiter = RateLimiter()
+admission = AdmissionController()
+
+
+def client_id(request) -> str:
+    if TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def _reject(status_code: int, retry_after: float, detail: str):
+    return JSONResponse(status_code=status_code, content={"detail": detail},
+                        headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+
+async def rate_limit_middleware(request, call_next):
+    path = request.url.path
+    if request.method == "OPTIONS" or path.startswith(EXEMPT_PREFIXES):
+        return await call_next(request)
+
+    route_class = classify(request.method, path)
+    rate, burst, _ = ROUTE_CLASSES[route_class]
+    wait = limiter.check(client_id(request), route_class, rate, burst)
+    if wait:
+        return _reject(429, wait, "Too many requests")
+
+    if not admission.try_acquire(route_class):
+        return _reject(503, 1, "Server busy, please retry")
+    try:
+        return await call_next(request)
+    finally:
+        admission.release(route_class)
+
+
+def stats() -> dict:
+    return {
+        "enabled": RATE_LIMITS_ENABLED,
+        "buckets": len(limiter._buckets),
+        "in_flight": dict(admission.in_flight),
+        "shed": dict(admission.shed),
+        "limits": {name: {"rate": r, "burst": b, "max_concurrent": c} for name, (r, b, c) in ROUTE_CLASSES.items()},
+    }
+
+
+def install(app):
+    """Attach the limiter middleware unless FLIGHTSIM_RATE_LIMITS=0."""
+    if RATE_LIMITS_ENABLED:
+        app.middleware("http")(rate_limit_middleware)
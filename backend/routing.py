@@ -0,0 +1,229 @@
+"""
+Route graph index and multi-leg itinerary search.
+
+`RouteIndex` keeps two time-sorted adjacency indexes over the in-memory
+flight snapshot (backend.inventory):
+
+- by origin:        every flight leaving a city, sorted by departure
+- by (origin, dest): every flight on a route, sorted by departure
+
+Each index is a pair of parallel lists (departure timestamps, records) so a
+departure window is two `bisect` calls. Updates replace both lists at once
+rather than mutating them, so searches read without taking the lock. Search
+expands first legs out of the origin inside the requested window, second
+legs out of each hub inside the layover window, and closes 1- and 2-stop
+itineraries with a direct route lookup into the destination, so the work is
+bounded by the layover windows rather than by the schedule size.
+
+The index follows catalogue changes incrementally through the inventory
+listener hook; seat counts are read from the (in-place updated) records at
+search time, so bookings never touch the index.
+"""
+import bisect
+import heapq
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Tuple
+
+from backend.inventory import FlightInventory, FlightRecord
+
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def city_key(city: str) -> str:
+    """Normalised city name; shared by every index or cache keyed on cities."""
+    return city.strip().casefold()
+
+
+def _ts(moment: datetime) -> float:
+    """Seconds since EPOCH for a naive UTC datetime (unlike .timestamp(), independent of the local timezone)."""
+    return (moment - EPOCH).total_seconds()
+
+
+class _Timeline:
+    """
+    Records sorted by departure; `times` mirrors `records` for bisect.
+
+    Writers (under RouteIndex._lock) build new lists and publish both with a
+    single attribute store, so lock-free readers always see a matching pair.
+    """
+
+    __slots__ = ("lists",)
+
+    def __init__(self):
+        self.lists = ([], [])
+
+    def add(self, record: FlightRecord):
+        times, records = self.lists
+        ts = _ts(record.departure)
+        i = bisect.bisect_right(times, ts)
+        self.lists = (times[:i] + [ts] + times[i:], records[:i] + [record] + records[i:])
+
+    def remove(self, record: FlightRecord) -> bool:
+        times, records = self.lists
+        ts = _ts(record.departure)
+        i = bisect.bisect_left(times, ts)
+        while i < len(times) and times[i] == ts:
+            if records[i].id == record.id:
+                self.lists = (times[:i] + times[i + 1:], records[:i] + records[i + 1:])
+                return True
+            i += 1
+        return False
+
+    def window(self, start: float, end: float):
+        times, records = self.lists
+        lo = bisect.bisect_left(times, start)
+        hi = bisect.bisect_right(times, end, lo)
+        return records[lo:hi]
+
+
+class Itinerary:
+    __slots__ = ("legs", "total_price", "duration_minutes", "layover_minutes")
+
+    def __init__(self, legs, total_price: float):
+        self.legs = legs
+        self.total_price = round(total_price, 2)
+        self.duration_minutes = int((legs[-1].arrival - legs[0].departure).total_seconds() // 60)
+        self.layover_minutes = [
+            int((nxt.departure - prev.arrival).total_seconds() // 60)
+            for prev, nxt in zip(legs, legs[1:])
+        ]
+
+    @property
+    def stops(self) -> int:
+        return len(self.legs) - 1
+
+
+class RouteIndex:
+    def __init__(self):
+        self._by_origin: Dict[str, _Timeline] = {}
+        self._by_route: Dict[Tuple[str, str], _Timeline] = {}
+        self._lock = threading.Lock()
+        self.size = 0
+
+    # ---------- maintenance ----------
+    def build(self, records):
+        by_origin, by_route = {}, {}
+        ordered = sorted(records, key=lambda r: r.departure)
+        for r in ordered:
+            o, d = city_key(r.origin), city_key(r.destination)
+            for timeline in (by_origin.setdefault(o, _Timeline()), by_route.setdefault((o, d), _Timeline())):
+                timeline.lists[0].append(_ts(r.departure))
+                timeline.lists[1].append(r)
+        with self._lock:
+            self._by_origin, self._by_route, self.size = by_origin, by_route, len(ordered)
+
+    def add(self, record: FlightRecord):
+        o, d = city_key(record.origin), city_key(record.destination)
+        with self._lock:
+            self._by_origin.setdefault(o, _Timeline()).add(record)
+            self._by_route.setdefault((o, d), _Timeline()).add(record)
+            self.size += 1
+
+    def remove(self, record: FlightRecord):
+        o, d = city_key(record.origin), city_key(record.destination)
+        with self._lock:
+            by_origin, by_route = self._by_origin.get(o), self._by_route.get((o, d))
+            if by_route is not None:
+                by_route.remove(record)
+            if by_origin is not None and by_origin.remove(record):
+                self.size -= 1
+
+    def attach(self, inventory: FlightInventory):
+        """Build from the snapshot now and follow its catalogue changes from here on."""
+        def on_change(event, record):
+            if event == "load":
+                self.build(inventory.all())
+            elif event == "upsert":
+                self.add(record)
+            elif event == "remove":
+                self.remove(record)
+
+        inventory.add_listener(on_change)
+        if inventory.loaded:
+            self.build(inventory.all())
+
+    # ---------- search ----------
+    def search(
+        self,
+        origin: str,
+        destination: str,
+        depart_from: datetime,
+        depart_to: datetime,
+        price_fn: Callable[[FlightRecord], float],
+        max_stops: int = 2,
+        min_layover: timedelta = timedelta(minutes=45),
+        max_layover: timedelta = timedelta(hours=6),
+        sort_by: str = "price",
+        limit: int = 20,
+    ) -> List[Itinerary]:
+        o, d = city_key(origin), city_key(destination)
+        if o == d:
+            return []
+        by_origin, by_route = self._by_origin, self._by_route
+        min_l, max_l = min_layover.total_seconds(), max_layover.total_seconds()
+
+        prices = {}
+
+        def price(r):
+            p = prices.get(r.id)
+            if p is None:
+                p = prices[r.id] = price_fn(r)
+            return p
+
+        def connections(timeline, after: FlightRecord):
+            if timeline is None:
+                return ()
+            arrived = _ts(after.arrival)
+            return timeline.window(arrived + min_l, arrived + max_l)
+
+        candidates = []
+        first_legs = by_origin.get(o)
+        if first_legs is None:
+            return []
+        for leg1 in first_legs.window(_ts(depart_from), _ts(depart_to)):
+            if leg1.seats_available <= 0:
+                continue
+            hub1 = city_key(leg1.destination)
+            if hub1 == d:
+                candidates.append((leg1,))
+                continue
+            if max_stops < 1 or hub1 == o:
+                continue
+            for leg2 in connections(by_route.get((hub1, d)), leg1):
+                if leg2.seats_available > 0:
+                    candidates.append((leg1, leg2))
+            if max_stops < 2:
+                continue
+            for leg2 in connections(by_origin.get(hub1), leg1):
+                hub2 = city_key(leg2.destination)
+                if leg2.seats_available <= 0 or hub2 in (o, d, hub1):
+                    continue
+                for leg3 in connections(by_route.get((hub2, d)), leg2):
+                    if leg3.seats_available > 0:
+                        candidates.append((leg1, leg2, leg3))
+
+        if sort_by == "duration":
+            score = lambda legs: (legs[-1].arrival - legs[0].departure, len(legs))
+        else:
+            score = lambda legs: (sum(price(r) for r in legs), len(legs))
+        best = heapq.nsmallest(limit, candidates, key=score)
+        return [Itinerary(list(legs), sum(price(r) for r in legs)) for legs in best]
+
+
+def pair_round_trips(outbound: List[Itinerary], inbound: List[Itinerary], min_turnaround: timedelta,
+                     sort_by: str = "price", limit: int = 20):
+    """Combine outbound/return itineraries whose return departs after the outbound arrives."""
+    pairs = [
+        (out, back) for out in outbound for back in inbound
+        if back.legs[0].departure - out.legs[-1].arrival >= min_turnaround
+    ]
+    if sort_by == "duration":
+        key = lambda p: p[0].duration_minutes + p[1].duration_minutes
+    else:
+        key = lambda p: p[0].total_price + p[1].total_price
+    return heapq.nsmallest(limit, pairs, key=key)
+
+
+route_index = RouteIndex()
@@ -2,13 +2,13 @@
 from datetime import datetime, timedelta, timezone
 from decimal import Decimal
 import random
-from main import SessionLocal, Airline, Flight, Base, engine
+from main import SessionLocal, Airline, Flight, init_db, shards
 
 # India Standard Time (UTC+5:30)
 IST = timezone(timedelta(hours=5, minutes=30))
 
 def seed_db():
-    Base.metadata.create_all(bind=engine)
+    init_db()
     db = SessionLocal()
     try:
         # clear old data
@@ -26,6 +26,7 @@ def seed_db():
         ]
         db.add_all(airlines)
         db.commit()
+        shards.replicate(Airline.__table__)  # every shard joins flights to its own copy
 
         # list of cities
         cities = [
@@ -0,0 +1,144 @@
+"""
+Fast response encoding for large row lists.
+
+List endpoints (/flights, /search, /bookings) hand rows over as plain
+tuples plus a column list, skipping per-row Pydantic model construction.
+The format is negotiated from `Accept`:
+
+- application/json (default): row objects, same shape as before, encoded
+  with orjson when it is installed (stdlib json otherwise)
+- application/x-msgpack: columnar {"columns": [...], "data": [[col0...], ...]}
+  (needs `msgpack`)
+- application/vnd.apache.arrow.stream: Arrow IPC stream (needs `pyarrow`)
+
+Bodies above COMPRESS_MIN_BYTES are compressed with brotli (if installed)
+or gzip, depending on `Accept-Encoding`. Both headers are matched by
+q-value, so `;q=0` rules a format or encoding out. All three libraries
+are optional; without them the endpoints still answer with plain JSON.
+"""
+import gzip
+import importlib.util
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+# pyarrow takes longer to import than the rest of the app put together, so it
+# is only located here and imported on the first Arrow request.
+HAS_ARROW = importlib.util.find_spec("pyarrow") is not None
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+JSON = "application/json"
+MSGPACK = "application/x-msgpack"
+ARROW = "application/vnd.apache.arrow.stream"
+COMPRESS_MIN_BYTES = 1024
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def encode_json(columns, rows) -> bytes:
+    objects = [dict(zip(columns, row)) for row in rows]
+    if orjson is not None:
+        return orjson.dumps(objects, default=_default)
+    return json.dumps(objects, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def encode_msgpack(columns, rows) -> bytes:
+    data = [list(col) for col in zip(*rows)] if rows else [[] for _ in columns]
+    return msgpack.packb({"columns": list(columns), "data": data}, default=_default, datetime=False)
+
+
+def encode_arrow(columns, rows) -> bytes:
+    import pyarrow as pa
+
+    data = list(zip(*rows)) if rows else [() for _ in columns]
+    table = pa.table({name: list(values) for name, values in zip(columns, data)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _qvalues(header: str) -> dict:
+    """{token: q} for an Accept / Accept-Encoding header; parameters other than q are ignored."""
+    values = {}
+    for item in (header or "").lower().split(","):
+        token, *params = [part.strip() for part in item.split(";")]
+        if not token:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = min(max(float(value), 0.0), 1.0)
+                except ValueError:
+                    q = 0.0
+        values.setdefault(token, q)
+    return values
+
+
+def negotiate(accept: str) -> str:
+    """
+    Highest-q media type we can produce. Binary formats must be named
+    explicitly (wildcards only ever select JSON); ties go to the binary
+    formats, and JSON is the fallback when nothing acceptable is left.
+    """
+    q = _qvalues(accept)
+    if not q:
+        return JSON
+    candidates = [(q.get(JSON, q.get("application/*", q.get("*/*", 0.0))), 0, JSON)]
+    if msgpack is not None:
+        candidates.append((q.get(MSGPACK, 0.0), 2, MSGPACK))
+    if HAS_ARROW:
+        candidates.append((q.get(ARROW, 0.0), 1, ARROW))
+    best, _, media_type = max(candidates)
+    return media_type if best > 0 else JSON
+
+
+def compress(body: bytes, accept_encoding: str):
+    """Returns (body, content-encoding or None)."""
+    if len(body) < COMPRESS_MIN_BYTES:
+        return body, None
+    q = _qvalues(accept_encoding)
+    anything = q.get("*", 0.0)
+    candidates = [(q.get("gzip", anything), 0, "gzip")]
+    if brotli is not None:
+        candidates.append((q.get("br", anything), 1, "br"))
+    best, _, encoding = max(candidates)
+    if best <= 0:
+        return body, None
+    if encoding == "br":
+        return brotli.compress(body, quality=4), "br"
+    return gzip.compress(body, compresslevel=5), "gzip"
+
+
+_ENCODERS = {JSON: encode_json, MSGPACK: encode_msgpack, ARROW: encode_arrow}
+
+
+def rows_response(request, columns, rows) -> Response:
+    """Encode `rows` (tuples ordered like `columns`) in the format the client asked for."""
+    media_type = negotiate(request.headers.get("accept"))
+    body, encoding = compress(_ENCODERS[media_type](columns, rows), request.headers.get("accept-encoding"))
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
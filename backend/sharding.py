@@ -0,0 +1,249 @@
+"""
+Sharded storage: flights, their bookings and their fare history are
+partitioned across several databases by flight id, so writes for unrelated
+flights no longer queue behind one SQLite writer.
+
+- Placement: shard = flight_id % shard_count (the same partitioning the
+  accelerated simulation uses). Bookings and fare history live with their
+  flight. PNRs are generated so that their number maps to the same shard,
+  so a PNR lookup touches one database.
+- Global data: airlines are replicated (upserted) from shard 0 to every
+  shard at startup (flights join them locally). Everything else (idempotency keys, leases, the id sequence)
+  lives on shard 0.
+- Ids: new flights get ids from a sequence row on shard 0, so ids stay
+  unique across shards. Booking and fare history ids are per shard.
+- Sessions: with more than one shard, `SessionLocal()` is a SQLAlchemy
+  ShardedSession. Queries that pin a flight id or PNR go to one shard;
+  anything else runs on every shard and the rows are concatenated. ORDER BY,
+  LIMIT and aggregates are not merged across shards that way, so endpoints
+  that need them run per-shard queries through `scatter()` and combine the
+  results themselves.
+
+FLIGHTSIM_SHARDS sets the shard count (default 1: a plain session on the
+single flights.db, exactly as before). Shard i > 0 defaults to
+flights_<i>.db next to flights.db; FLIGHTSIM_SHARD_URLS (comma-separated
+SQLAlchemy URLs, e.g. MySQL schemas) overrides the list. Changing the
+shard count of an existing deployment needs a data migration; nothing
+rebalances rows automatically.
+"""
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, event, insert, select, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.sql import operators
+
+SHARD_COUNT = int(os.getenv("FLIGHTSIM_SHARDS", "1"))
+DEFAULT_SHARD = "0"
+
+# table -> column holding the flight id it is partitioned by
+PARTITION_KEYS = {"flights": "id", "bookings": "flight_id", "fare_history": "flight_id"}
+GLOBAL_ID_TABLES = {"flights"}
+
+_sequences = Table(
+    "id_sequences", MetaData(),
+    Column("name", String, primary_key=True),
+    Column("next_value", Integer, nullable=False),
+)
+
+
+def shard_urls(base_url: str, count: int = SHARD_COUNT) -> list:
+    explicit = os.getenv("FLIGHTSIM_SHARD_URLS")
+    if explicit:
+        return [url.strip() for url in explicit.split(",") if url.strip()]
+    root, ext = os.path.splitext(base_url)
+    return [base_url] + [f"{root}_{i}{ext}" for i in range(1, count)]
+
+
+def _pinned_values(statement, table: str, column: str):
+    """Values of `table.column` pinned by top-level AND-ed `==` / IN criteria, or None if unpinned."""
+    for criterion in getattr(statement, "_where_criteria", ()):
+        left, right = getattr(criterion, "left", None), getattr(criterion, "right", None)
+        if getattr(left, "name", None) != column or getattr(getattr(left, "table", None), "name", None) != table:
+            continue
+        value = getattr(right, "effective_value", None)
+        if criterion.operator is operators.eq and value is not None:
+            return [value]
+        if criterion.operator is operators.in_op and value is not None:
+            return list(value)
+    return None
+
+
+class ShardRouter:
+    def __init__(self, urls, sqlite_connect_args=None, **engine_kwargs):
+        """`sqlite_connect_args` are passed to SQLite shards only (other drivers reject e.g. check_same_thread)."""
+        self.shard_ids = [str(i) for i in range(len(urls))]
+        self.engines = {sid: self._create_engine(url, sqlite_connect_args, engine_kwargs)
+                        for sid, url in zip(self.shard_ids, urls)}
+        self._plain = {sid: sessionmaker(bind=engine) for sid, engine in self.engines.items()}
+        self._pool = ThreadPoolExecutor(max_workers=len(urls), thread_name_prefix="shard") if len(urls) > 1 else None
+
+    @staticmethod
+    def _create_engine(url, sqlite_connect_args, engine_kwargs):
+        if sqlite_connect_args and make_url(url).get_backend_name() == "sqlite":
+            engine_kwargs = dict(engine_kwargs, connect_args=sqlite_connect_args)
+        return create_engine(url, **engine_kwargs)
+
+    @property
+    def count(self) -> int:
+        return len(self.shard_ids)
+
+    # ---------- placement ----------
+    def shard_for_flight(self, flight_id) -> str:
+        return self.shard_ids[int(flight_id) % self.count]
+
+    def shard_for_pnr(self, pnr: str):
+        digits = pnr[3:]
+        return self.shard_ids[int(digits) % self.count] if pnr.startswith("PNR") and digits.isdigit() else None
+
+    def new_pnr(self, flight_id) -> str:
+        """Random PNR whose number lands on the flight's shard."""
+        number = random.randint(100000, 999999)
+        number -= (number - int(flight_id)) % self.count
+        if number < 100000:
+            number += self.count
+        return f"PNR{number}"
+
+    # ---------- ShardedSession hooks ----------
+    def _shard_chooser(self, mapper, instance, clause=None):
+        table = mapper.local_table.name if mapper is not None else None
+        if instance is not None and table in PARTITION_KEYS:
+            return self.shard_for_flight(getattr(instance, PARTITION_KEYS[table]))
+        return DEFAULT_SHARD
+
+    def _identity_chooser(self, mapper, primary_key, *, lazy_loaded_from, **kw):
+        if lazy_loaded_from is not None:
+            return [lazy_loaded_from.identity_token]
+        table = mapper.local_table.name
+        if table == "flights":
+            return [self.shard_for_flight(primary_key[0])]
+        if table in PARTITION_KEYS:  # per-shard ids: could be anywhere
+            return self.shard_ids
+        return [DEFAULT_SHARD]
+
+    def _execute_chooser(self, orm_context):
+        if orm_context.is_select and orm_context.lazy_loaded_from is not None:
+            return [orm_context.lazy_loaded_from.identity_token]
+        mapper = orm_context.bind_mapper
+        table = mapper.local_table.name if mapper is not None else None
+        if table not in PARTITION_KEYS:
+            return [DEFAULT_SHARD]
+        statement = orm_context.statement
+        flight_ids = _pinned_values(statement, table, PARTITION_KEYS[table])
+        if flight_ids is not None:
+            return sorted({self.shard_for_flight(fid) for fid in flight_ids})
+        if table == "bookings":
+            pnrs = _pinned_values(statement, "bookings", "pnr")
+            shards = {self.shard_for_pnr(p) for p in pnrs} if pnrs else {None}
+            if None not in shards:
+                return sorted(shards)
+        return self.shard_ids
+
+    def _allocate_ids(self, session, flush_context, instances):
+        """before_flush: give new flights globally unique ids from the shard-0 sequence."""
+        pending = [obj for obj in session.new
+                   if obj.__table__.name in GLOBAL_ID_TABLES and obj.id is None]
+        for table in {obj.__table__.name for obj in pending}:
+            objs = [obj for obj in pending if obj.__table__.name == table]
+            start = self._reserve(session.connection(bind_arguments={"shard_id": DEFAULT_SHARD}), table, len(objs))
+            for offset, obj in enumerate(objs):
+                obj.id = start + offset
+
+    def _reserve(self, conn, name: str, count: int) -> int:
+        """Reserve `count` ids for `name`; returns the first. Runs in the caller's shard-0 transaction."""
+        bump = update(_sequences).where(_sequences.c.name == name).values(next_value=_sequences.c.next_value + count)
+        if not conn.execute(bump).rowcount:  # create_all() seeds the row; this covers a schema made without it
+            start = self._max_id(name) + 1
+            try:
+                conn.execute(insert(_sequences).values(name=name, next_value=start + count))
+                return start
+            except IntegrityError:  # another worker seeded it first: take ours from its row
+                conn.execute(bump)
+        return conn.execute(select(_sequences.c.next_value).where(_sequences.c.name == name)).scalar_one() - count
+
+    def _seed_sequences(self):
+        """Create the sequence row of every global-id table that has none yet."""
+        engine = self.engines[DEFAULT_SHARD]
+        for name in GLOBAL_ID_TABLES:
+            with engine.connect() as conn:
+                if conn.execute(select(_sequences.c.name).where(_sequences.c.name == name)).first():
+                    continue
+            try:
+                with engine.begin() as conn:
+                    conn.execute(insert(_sequences).values(name=name, next_value=self._max_id(name) + 1))
+            except IntegrityError:  # seeded concurrently by another worker
+                pass
+
+    def _max_id(self, table: str) -> int:
+        """Highest existing id across shards (seeds the sequence for a database that predates sharding)."""
+        highest = 0
+        for engine in self.engines.values():
+            with engine.connect() as conn:
+                highest = max(highest, conn.exec_driver_sql(f"SELECT COALESCE(MAX(id), 0) FROM {table}").scalar_one())
+        return highest
+
+    def session_factory(self, **kwargs):
+        if self.count == 1:
+            return sessionmaker(bind=self.engines[DEFAULT_SHARD], **kwargs)
+        factory = sessionmaker(class_=ShardedSession, shards=self.engines, shard_chooser=self._shard_chooser,
+                               identity_chooser=self._identity_chooser, execute_chooser=self._execute_chooser,
+                               **kwargs)
+        event.listen(factory, "before_flush", self._allocate_ids)
+        return factory
+
+    # ---------- schema / replication ----------
+    def create_all(self, metadata):
+        for engine in self.engines.values():
+            metadata.create_all(bind=engine)
+            for table in metadata.sorted_tables:
+                for index in table.indexes:
+                    index.create(bind=engine, checkfirst=True)
+        if self.count > 1:
+            _sequences.create(bind=self.engines[DEFAULT_SHARD], checkfirst=True)
+            self._seed_sequences()
+
+    def replicate(self, table):
+        """
+        Upsert `table` from shard 0 into every other shard. This runs on every
+        worker start against live shards, so rows that already match are not
+        written, and rows missing from shard 0 are left in place (flights on
+        that shard may still reference them).
+        """
+        if self.count == 1:
+            return
+        key_columns = list(table.primary_key.columns)
+
+        def key(row):
+            return tuple(row[c.name] for c in key_columns)
+
+        with self.engines[DEFAULT_SHARD].connect() as src:
+            source = {key(row): row for row in (dict(r._mapping) for r in src.execute(select(table)))}
+        for sid in self.shard_ids[1:]:
+            for attempt in range(2):
+                try:
+                    with self.engines[sid].begin() as dst:
+                        current = {key(row): row for row in (dict(r._mapping) for r in dst.execute(select(table)))}
+                        new = [row for k, row in source.items() if k not in current]
+                        if new:
+                            dst.execute(insert(table), new)
+                        for k, row in source.items():
+                            if k in current and current[k] != row:
+                                dst.execute(update(table).where(*(c == v for c, v in zip(key_columns, k))).values(row))
+                    break
+                except IntegrityError:  # another worker inserted the same rows first: compare again
+                    if attempt:
+                        raise
+
+    # ---------- scatter-gather ----------
+    def scatter(self, fn) -> list:
+        """Run fn(session) against every shard (in parallel) with a plain per-shard session; returns the results."""
+        def run(sid):
+            with self._plain[sid]() as session:
+                return fn(session)
+        if self._pool is None:
+            return [run(DEFAULT_SHARD)]
+        return list(self._pool.map(run, self.shard_ids))
@@ -0,0 +1,247 @@
+"""
+Accelerated booking/pricing simulation.
+
+Runs the same seat churn and repricing as the live `simulator_loop`, plus
+synthetic bookings and cancellations, on a virtual clock: each tick moves
+simulated time forward by `tick_seconds` without sleeping, so days of churn
+run in seconds. It always works on a scratch copy of the database (made
+with the SQLite backup API), never on the live file.
+
+Flights are partitioned by `id % shards`; each shard runs in its own
+process against the shared scratch DB (WAL mode), which is how the booking
+and pricing write paths get capacity-tested under contention. Per-tick
+stats (simulated time, bookings, cancellations, reprices, DB time and
+write throughput) are aggregated across shards and can be exported as
+CSV or JSON.
+
+Usage
+    python -m backend.simulation --db flights.db --days 3 --shards 4 --out sim_stats.csv
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from backend.pricing import DEFAULT_PRICING, PricingParams, price_for
+
+SEAT_CHURN = (-2, -1, 0, 0, 1)  # small churn, shared with the live simulator_loop
+DEFAULT_TICK_SECONDS = 60
+
+
+def churn_seats(seats_available: int, total_seats: int, rng=random) -> int:
+    change = rng.choice(SEAT_CHURN)
+    return max(0, min(total_seats, seats_available + change))
+
+
+def random_demand(rng=random) -> float:
+    return rng.uniform(0.2, 0.9)
+
+
+class VirtualClock:
+    def __init__(self, start: datetime, tick_seconds: float = DEFAULT_TICK_SECONDS):
+        self.now = start
+        self.step = timedelta(seconds=tick_seconds)
+        self.ticks = 0
+
+    def advance(self) -> datetime:
+        self.now += self.step
+        self.ticks += 1
+        return self.now
+
+
+def scratch_copy(src_path: str, dst_path: str = None) -> str:
+    """Copy a SQLite DB (consistently, even while in use) to a scratch file in WAL mode."""
+    if dst_path is None:
+        fd, dst_path = tempfile.mkstemp(prefix="flightsim-", suffix=".db")
+        os.close(fd)
+    src = sqlite3.connect(src_path)
+    dst = sqlite3.connect(dst_path)
+    try:
+        src.backup(dst)
+        dst.execute("PRAGMA journal_mode=WAL")
+    finally:
+        src.close()
+        dst.close()
+    return dst_path
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=60)
+    conn.execute("PRAGMA busy_timeout=60000")
+    return conn
+
+
+def _db_dt(value: datetime) -> str:
+    return value.strftime("%Y-%m-%d %H:%M:%S.%f")  # SQLAlchemy's SQLite DateTime format
+
+
+def _parse_dt(value):
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    return datetime.fromisoformat(str(value)).replace(tzinfo=None)
+
+
+def run_shard(db_path: str, shard: int, shards: int, start_iso: str, ticks: int,
+              tick_seconds: float, booking_rate: float, cancel_rate: float, seed: int, params: dict = None):
+    """Worker: simulate `ticks` ticks for flights with id % shards == shard. Returns per-tick stats."""
+    rng = random.Random(seed + shard)
+    pricing = PricingParams(**params) if params else DEFAULT_PRICING
+    clock = VirtualClock(datetime.fromisoformat(start_iso), tick_seconds)
+    conn = _connect(db_path)
+
+    flights = [
+        [fid, float(base), total, avail, _parse_dt(dep), tier or "standard"]
+        for fid, base, total, avail, dep, tier in conn.execute(
+            "SELECT f.id, f.base_fare, f.total_seats, f.seats_available, f.departure, a.tier "
+            "FROM flights f LEFT JOIN airlines a ON a.id = f.airline_id WHERE f.id % ? = ?",
+            (shards, shard),
+        )
+    ]
+    sim_bookings = {}  # flight_id -> [pnr, ...] created by this run (cancellation candidates)
+    pnr_seq = 0
+    stats = []
+
+    for _ in range(ticks):
+        now = clock.advance()
+        stamp = _db_dt(now)
+        seat_updates, fares, new_bookings, cancels = [], [], [], []
+        for flight in flights:
+            fid, base, total, avail, departure, tier = flight
+            if departure <= now:
+                continue
+            new_avail = churn_seats(avail, total, rng)
+
+            if new_avail > 0 and rng.random() < booking_rate:
+                price = price_for(pricing, base, new_avail, total, departure, random_demand(rng), tier, now)
+                pnr_seq += 1
+                pnr = f"SIM{shard}-{pnr_seq}"
+                new_bookings.append((pnr, fid, "Sim Passenger", price, "CONFIRMED", "PAID", stamp, stamp))
+                sim_bookings.setdefault(fid, []).append(pnr)
+                new_avail -= 1
+            if sim_bookings.get(fid) and rng.random() < cancel_rate:
+                cancels.append((stamp, sim_bookings[fid].pop(rng.randrange(len(sim_bookings[fid])))))
+                new_avail = min(total, new_avail + 1)
+
+            if new_avail != avail:
+                flight[3] = new_avail
+                seat_updates.append((new_avail, fid))
+                fares.append((fid, stamp, price_for(pricing, base, new_avail, total, departure, random_demand(rng), tier, now)))
+
+        started = time.perf_counter()
+        with conn:  # one transaction per tick, like the live simulator
+            conn.executemany("UPDATE flights SET seats_available = ? WHERE id = ?", seat_updates)
+            conn.executemany("INSERT INTO fare_history (flight_id, recorded_at, price) VALUES (?, ?, ?)", fares)
+            conn.executemany(
+                "INSERT INTO bookings (pnr, flight_id, passenger_name, price_paid, status, payment_status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", new_bookings)
+            conn.executemany("UPDATE bookings SET status = 'CANCELLED', updated_at = ? WHERE pnr = ?", cancels)
+        db_seconds = time.perf_counter() - started
+
+        stats.append({
+            "tick": clock.ticks,
+            "sim_time": now.isoformat(timespec="seconds"),
+            "bookings": len(new_bookings),
+            "cancellations": len(cancels),
+            "reprices": len(fares),
+            "writes": len(seat_updates) + len(fares) + len(new_bookings) + len(cancels),
+            "db_seconds": db_seconds,
+        })
+    conn.close()
+    return stats
+
+
+def _merge(shard_stats):
+    merged = []
+    for rows in zip(*shard_stats):
+        tick = {"tick": rows[0]["tick"], "sim_time": rows[0]["sim_time"]}
+        for key in ("bookings", "cancellations", "reprices", "writes"):
+            tick[key] = sum(r[key] for r in rows)
+        # shards run concurrently: the tick took as long as its slowest shard
+        tick["db_ms"] = round(max(r["db_seconds"] for r in rows) * 1000, 3)
+        tick["writes_per_sec"] = round(tick["writes"] / max(tick["db_ms"] / 1000, 1e-9), 1)
+        merged.append(tick)
+    return merged
+
+
+def run_simulation(db_path: str, days: float = 1.0, tick_seconds: float = DEFAULT_TICK_SECONDS, shards: int = 1,
+                   booking_rate: float = 0.05, cancel_rate: float = 0.005, seed: int = 42,
+                   start: datetime = None, params: PricingParams = None, scratch_path: str = None, keep: bool = False) -> dict:
+    """Run the accelerated simulation on a scratch copy of `db_path` and return aggregated stats."""
+    scratch = scratch_copy(db_path, scratch_path)
+    ticks = int(days * 86400 // tick_seconds)
+    start_iso = (start or datetime.utcnow()).isoformat()
+    param_dict = params.as_dict() if params else None
+    args = [(scratch, s, shards, start_iso, ticks, tick_seconds, booking_rate, cancel_rate, seed, param_dict)
+            for s in range(shards)]
+
+    started = time.perf_counter()
+    try:
+        if shards == 1:
+            shard_stats = [run_shard(*args[0])]
+        else:
+            with ProcessPoolExecutor(max_workers=shards) as pool:
+                shard_stats = list(pool.map(run_shard, *zip(*args)))
+    finally:
+        if not keep:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(scratch + suffix):
+                    os.remove(scratch + suffix)
+    wall = time.perf_counter() - started
+
+    per_tick = _merge(shard_stats)
+    totals = {k: sum(t[k] for t in per_tick) for k in ("bookings", "cancellations", "reprices", "writes")}
+    return {
+        "ticks": ticks,
+        "simulated_seconds": ticks * tick_seconds,
+        "wall_seconds": round(wall, 3),
+        "speedup": round(ticks * tick_seconds / wall, 1) if wall else None,
+        "shards": shards,
+        "writes_per_sec": round(totals["writes"] / wall, 1) if wall else None,
+        "scratch_db": scratch if keep else None,
+        **totals,
+        "per_tick": per_tick,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run days of booking/pricing churn on a virtual clock")
+    parser.add_argument("--db", default="flights.db", help="SQLite file to copy (never modified)")
+    parser.add_argument("--days", type=float, default=1.0)
+    parser.add_argument("--tick", type=float, default=DEFAULT_TICK_SECONDS, help="simulated seconds per tick")
+    parser.add_argument("--shards", type=int, default=1, help="worker processes (flights partitioned by id)")
+    parser.add_argument("--booking-rate", type=float, default=0.05, help="booking probability per flight per tick")
+    parser.add_argument("--cancel-rate", type=float, default=0.005, help="cancellation probability per flight per tick")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", metavar="PATH", help="keep the scratch DB at PATH")
+    parser.add_argument("--out", help="write per-tick stats to .csv or .json")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} not found")
+    report = run_simulation(args.db, args.days, args.tick, args.shards, args.booking_rate, args.cancel_rate,
+                            args.seed, scratch_path=args.keep, keep=bool(args.keep))
+
+    print(f"Simulated {report['simulated_seconds'] / 3600:.1f}h in {report['wall_seconds']}s "
+          f"(x{report['speedup']}) on {report['shards']} shard(s)")
+    print(f"bookings={report['bookings']} cancellations={report['cancellations']} "
+          f"reprices={report['reprices']} writes/s={report['writes_per_sec']}")
+
+    if args.out:
+        if args.out.endswith(".json"):
+            with open(args.out, "w", encoding="utf-8") as fh:
+                json.dump(report, fh, indent=2)
+        else:
+            with open(args.out, "w", newline="", encoding="utf-8") as fh:
+                writer = csv.DictWriter(fh, fieldnames=list(report["per_tick"][0]) if report["per_tick"] else ["tick"])
+                writer.writeheader()
+                writer.writerows(report["per_tick"])
+
+
+if __name__ == "__main__":
+    main()
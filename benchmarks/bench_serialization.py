@@ -0,0 +1,90 @@
+"""
+Serialization benchmark for the list endpoints (/flights, /search, /bookings).
+
+Compares the old path (a Pydantic FlightOut per row, then FastAPI-style
+jsonable_encoder + json.dumps) with the direct encoders in
+backend/serialization.py: stdlib JSON, orjson, columnar MessagePack and
+Arrow IPC. It reports encode time and payload size (raw / gzip / brotli).
+Encoders whose optional library is not installed are skipped.
+
+    python benchmarks/bench_serialization.py --rows 1000 10000
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from backend import serialization as ser  # noqa: E402
+from backend.inventory import FLIGHT_COLUMNS  # noqa: E402
+from backend.main import FlightOut  # noqa: E402
+
+
+def make_rows(n):
+    start = datetime(2026, 1, 1, 6, 0)
+    cities = ["Mumbai", "Delhi", "Bangalore", "Chennai", "Hyderabad", "Pune", "Kolkata", "Goa"]
+    rows = []
+    for i in range(n):
+        dep = start + timedelta(minutes=37 * i)
+        rows.append((i + 1, f"6E{100 + i}", cities[i % 8], cities[(i + 3) % 8], dep, dep + timedelta(hours=2, minutes=i % 60),
+                     round(2500 + (i * 7919) % 6500 + 0.5, 2), (i * 13) % 180, 180, "IndiGo"))
+    return rows
+
+
+def pydantic_baseline(columns, rows):
+    models = [FlightOut(**dict(zip(columns, r))) for r in rows]
+    return json.dumps(jsonable_encoder(models), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def stdlib_json(columns, rows):
+    orjson, ser.orjson = ser.orjson, None
+    try:
+        return ser.encode_json(columns, rows)
+    finally:
+        ser.orjson = orjson
+
+
+def timed(fn, *args, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        out = fn(*args)
+        best = min(best, time.perf_counter() - t)
+    return best, out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    encoders = [("pydantic + json (old)", pydantic_baseline), ("direct json (stdlib)", stdlib_json)]
+    if ser.orjson is not None:
+        encoders.append(("direct json (orjson)", ser.encode_json))
+    if ser.msgpack is not None:
+        encoders.append(("msgpack columnar", ser.encode_msgpack))
+    if ser.HAS_ARROW:
+        encoders.append(("arrow ipc", ser.encode_arrow))
+
+    for n in args.rows:
+        rows = make_rows(n)
+        print(f"\n{n} rows")
+        print(f"{'encoder':<24}{'encode ms':>11}{'speedup':>9}{'raw KB':>10}{'gzip KB':>10}{'br KB':>9}")
+        baseline = None
+        for name, fn in encoders:
+            seconds, body = timed(fn, FLIGHT_COLUMNS, rows, repeat=args.repeat)
+            baseline = baseline or seconds
+            gz = len(gzip.compress(body, compresslevel=5)) / 1024
+            br = f"{len(ser.brotli.compress(body, quality=4)) / 1024:9.1f}" if ser.brotli else f"{'-':>9}"
+            print(f"{name:<24}{seconds * 1000:11.2f}{baseline / seconds:8.1f}x{len(body) / 1024:10.1f}{gz:10.1f}{br}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Booking write-throughput benchmark across shard counts.
+
+For each shard count it seeds fresh scratch databases (FLIGHTSIM_SHARDS=N),
+then runs a fixed number of writer processes that call the real booking
+path (`_initiate_booking`: lock the flight row, decrement seats, insert the
+booking) against random flights for a fixed time. With one shard every
+writer queues on the single SQLite write lock; with N shards, writes for
+flights on different shards commit in parallel, so throughput is expected
+to grow with the shard count until writers, CPU or disk become the
+bottleneck. That is unverified: on a single-CPU machine every shard count
+ran at the same ~200-290 bookings/s, because the writers are CPU-bound
+there; run it on a multi-core host before relying on it.
+
+    python benchmarks/bench_sharding.py --shards 1 2 4 --writers 8 --seconds 10
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _load_app(shards, cwd):
+    """Import backend.main configured for `shards` databases in `cwd` (runs inside a fresh process)."""
+    os.environ["FLIGHTSIM_SHARDS"] = str(shards)
+    os.chdir(cwd)
+    sys.path.insert(0, ROOT)
+    from backend import main
+    return main
+
+
+def _prepare(shards, cwd, flights):
+    main = _load_app(shards, cwd)
+    main.init_db()
+    db = main.SessionLocal()
+    try:
+        airline = main.Airline(name="IndiGo", tier="budget")
+        db.add(airline)
+        db.commit()
+        main.shards.replicate(main.Airline.__table__)
+        departure = datetime.utcnow() + timedelta(days=7)
+        db.add_all([
+            main.Flight(flight_no=f"6E{1000 + i}", airline_id=airline.id, origin="Delhi", destination="Mumbai",
+                        departure=departure, arrival=departure + timedelta(hours=2), base_fare=4500,
+                        total_seats=1_000_000, seats_available=1_000_000)
+            for i in range(flights)
+        ])
+        db.commit()
+        return [fid for (fid,) in db.query(main.Flight.id)]
+    finally:
+        db.close()
+
+
+def _writer(shards, cwd, flight_ids, seconds, seed):
+    main = _load_app(shards, cwd)
+    rng = random.Random(seed)
+    ok = failed = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        req = main.BookingRequest(flight_id=rng.choice(flight_ids),
+                                  passenger=main.Passenger(passenger_name="Bench Passenger", passenger_phone="9999999999"))
+        db = main.SessionLocal()
+        try:
+            main._initiate_booking(req, db)
+            ok += 1
+        except Exception:  # lock timeouts surface as HTTPException(500)
+            failed += 1
+        finally:
+            db.close()
+    return ok, failed
+
+
+def run(shards, writers, seconds, flights):
+    ctx = multiprocessing.get_context("spawn")  # each writer gets its own engines and connections
+    with tempfile.TemporaryDirectory(prefix=f"flightsim-shards{shards}-") as cwd:
+        with ctx.Pool(1) as pool:
+            flight_ids = pool.apply(_prepare, (shards, cwd, flights))
+        with ctx.Pool(writers) as pool:
+            started = time.perf_counter()
+            results = pool.starmap(_writer, [(shards, cwd, flight_ids, seconds, seed) for seed in range(writers)])
+            wall = time.perf_counter() - started
+    ok = sum(r[0] for r in results)
+    failed = sum(r[1] for r in results)
+    return ok, failed, ok / seconds, wall
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--writers", type=int, default=8, help="concurrent writer processes")
+    parser.add_argument("--seconds", type=float, default=10.0, help="write phase length per shard count")
+    parser.add_argument("--flights", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    print(f"{args.writers} writers, {args.seconds:g}s per run, {args.flights} flights")
+    print(f"{'shards':>6}{'bookings':>10}{'failed':>8}{'bookings/s':>12}{'scaling':>9}")
+    baseline = None
+    for shards in args.shards:
+        ok, failed, rate, _ = run(shards, args.writers, args.seconds, args.flights)
+        baseline = baseline or rate
+        print(f"{shards:>6}{ok:>10}{failed:>8}{rate:>12.1f}{rate / baseline if baseline else 0:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Cold-start benchmark for the API process.
+
+Measures, in fresh interpreter processes:
+
+- import time: `python -c "import backend.main"` wall time, plus the
+  heaviest top-level imports reported by `python -X importtime`
+- time to first request: from spawning `uvicorn backend.main:app` until
+  GET /flights first answers 200 (includes init_db() and the inventory load)
+
+Each run uses an empty scratch directory as cwd, so it gets its own
+flights.db and never touches the real one.
+
+    python benchmarks/bench_startup.py --repeat 5
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _env():
+    env = dict(os.environ)
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def import_time(cwd):
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import backend.main"], cwd=cwd, env=_env(), check=True)
+    return time.perf_counter() - started
+
+
+def heaviest_imports(cwd, top):
+    """Top-level modules pulled in by backend.main, by cumulative import time (us)."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import backend.main"],
+                          cwd=cwd, env=_env(), check=True, capture_output=True, text=True)
+    totals = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if name.startswith("   ") and not name.startswith("     "):  # direct imports of backend.main
+            totals[name.strip()] = int(cumulative)
+    return sorted(totals.items(), key=lambda kv: kv[1], reverse=True)[:top]
+
+
+def time_to_first_request(cwd, timeout):
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/flights"
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port), "--log-level", "warning"],
+                            cwd=cwd, env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {proc.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as resp:
+                    if resp.status == 200:
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.005)
+        raise RuntimeError(f"no response from {url} within {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def _summary(samples):
+    ms = [s * 1000 for s in samples]
+    return f"median {statistics.median(ms):8.1f} ms   min {min(ms):8.1f} ms   max {max(ms):8.1f} ms"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="heaviest imports to list")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="flightsim-startup-") as cwd:
+        imports = [import_time(cwd) for _ in range(args.repeat)]
+        first_request = [time_to_first_request(cwd, args.timeout) for _ in range(args.repeat)]
+        heaviest = heaviest_imports(cwd, args.top)
+
+    print(f"import backend.main      {_summary(imports)}")
+    print(f"start -> first request   {_summary(first_request)}")
+    print("\nheaviest imports (cumulative)")
+    for name, micros in heaviest:
+        print(f"  {name:<32}{micros / 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 // src/pages/BookingPage.jsx
 import { useNavigate, useParams, useLocation } from "react-router-dom";
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import { ArrowPathIcon } from "@heroicons/react/24/outline";
 import toast from "react-hot-toast";
 
@@ -18,6 +18,7 @@ export default function BookingPage() {
   const [passengerName, setPassengerName] = useState("");
   const [passengerPhone, setPassengerPhone] = useState("");
   const [response, setResponse] = useState(null);
+  const idempotencyKey = useRef(crypto.randomUUID()); // retries never double-book
 
   // ✅ Fetch flight details (with dynamic price)
   useEffect(() => {
@@ -38,6 +39,16 @@ export default function BookingPage() {
     fetchFlight();
   }, [flightId]);
 
+  // 🔴 Live price/seat updates pushed by the server (no re-polling)
+  useEffect(() => {
+    const source = new EventSource(`http://127.0.0.1:8000/stream/prices?flights=${flightId}`);
+    source.addEventListener("flight", (e) => {
+      const delta = JSON.parse(e.data);
+      setFlightData((prev) => (prev ? { ...prev, ...delta } : prev));
+    });
+    return () => source.close();
+  }, [flightId]);
+
   const handleBooking = async () => {
     if (!passengerName.trim()) {
       toast.error("Please enter passenger name.");
@@ -62,7 +73,10 @@ export default function BookingPage() {
       toast.loading("Booking your flight...");
       const res = await fetch("http://127.0.0.1:8000/booking/initiate", {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
+        headers: {
+          "Content-Type": "application/json",
+          "Idempotency-Key": idempotencyKey.current,
+        },
         body: JSON.stringify(bookingPayload),
       });
       toast.dismiss();
@@ -57,15 +57,39 @@ export default function Dashboard() {
     }
   };
 
-  // ✅ Initial fetch + Auto refresh every 60s
+  // ✅ Initial fetch, then apply live deltas pushed by the server.
+  // Deltas only come from the worker this stream is connected to and are
+  // lost while disconnected, so re-fetch the totals on every (re)connect
+  // and still refresh every 60s to pick up other workers' bookings.
   useEffect(() => {
     fetchDashboardData();
-
     const interval = setInterval(() => {
       fetchDashboardData();
     }, 60000); // 60 seconds
 
-    return () => clearInterval(interval);
+    const source = new EventSource("http://127.0.0.1:8000/stream/dashboard");
+    source.addEventListener("open", () => fetchDashboardData());
+    source.addEventListener("dashboard", (e) => {
+      const delta = JSON.parse(e.data);
+      setStats((prev) => ({
+        ...prev,
+        bookings: prev.bookings + delta.bookings,
+        revenue: Number(prev.revenue || 0) + delta.revenue,
+        passengers: prev.passengers + delta.passengers,
+      }));
+      setChartData((prev) => {
+        const next = prev.map((d) => ({ ...d, bookings: d.bookings + (delta.trend[d.name] || 0) }));
+        Object.entries(delta.trend)
+          .filter(([day]) => !prev.some((d) => d.name === day))
+          .forEach(([day, count]) => next.push({ name: day, bookings: count }));
+        return next;
+      });
+    });
+
+    return () => {
+      clearInterval(interval);
+      source.close();
+    };
   }, []);
 
   if (loading) {
@@ -126,7 +150,7 @@ export default function Dashboard() {
         <h2 className="text-lg font-semibold mb-4 flex justify-between items-center">
           Weekly Booking Trends
           <span className="text-sm text-gray-400">
-            Auto-refreshes every 60s ⏱️
+            Live updates 🔴
           </span>
         </h2>
         {chartData.length > 0 ? (
@@ -1,6 +1,6 @@
 // src/pages/PaymentPage.jsx
 import { useParams, useNavigate, useLocation } from "react-router-dom";
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import {
   ArrowPathIcon,
   CheckIcon,
@@ -18,6 +18,7 @@ export default function PaymentPage() {
   const { pnr } = useParams();
   const navigate = useNavigate();
   const location = useLocation();
+  const attemptId = useRef(crypto.randomUUID()); // retries reuse the same Idempotency-Key
   const baseFare = location.state?.totalPrice || 0;
 
   const [addons, setAddons] = useState({
@@ -53,7 +54,10 @@ export default function PaymentPage() {
 
       const res = await fetch(`http://127.0.0.1:8000/booking/pay/${pnr}`, {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
+        headers: {
+          "Content-Type": "application/json",
+          "Idempotency-Key": `${attemptId.current}-${status}`,
+        },
         body: JSON.stringify({ success: isSuccess, amount: totalAmount }),
       });
 
@@ -42,6 +42,17 @@ export default function SeatSelection() {
     fetchFlight();
   }, [flightId]);
 
+  // 🔴 Live price/seat updates pushed by the server (no re-polling)
+  useEffect(() => {
+    const source = new EventSource(`http://127.0.0.1:8000/stream/prices?flights=${flightId}`);
+    source.addEventListener("flight", (e) => {
+      const delta = JSON.parse(e.data);
+      setFlight((prev) => (prev ? { ...prev, ...delta } : prev));
+      if (delta.dynamic_price) setBasePrice(delta.dynamic_price);
+    });
+    return () => source.close();
+  }, [flightId]);
+
   // 💰 Dynamic price recalculation
   useEffect(() => {
     if (!basePrice) return;
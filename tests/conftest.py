@@ -0,0 +1,37 @@
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+# read by backend.main at import time; its engines resolve ./flights.db against
+# the cwd at import, so move to a scratch directory before any test imports it
+os.environ.setdefault("FLIGHTSIM_PROFILING", "1")
+os.environ.setdefault("FLIGHTSIM_RATE_LIMITS", "0")
+os.chdir(tempfile.mkdtemp(prefix="flightsim-tests-"))
+
+
+@pytest.fixture
+def client():
+    """TestClient on backend.main.app over a freshly created scratch DB holding a few flights."""
+    from fastapi.testclient import TestClient
+    from backend import main
+
+    for engine in main.shards.engines.values():
+        main.Base.metadata.drop_all(bind=engine)
+    main.init_db()
+    db = main.SessionLocal()
+    airline = main.Airline(name="IndiGo", tier="budget")
+    db.add(airline)
+    db.commit()
+    departure = datetime.utcnow() + timedelta(days=2)
+    db.add_all([
+        main.Flight(flight_no=f"6E{100 + i}", airline_id=airline.id, origin="Delhi", destination="Mumbai",
+                    departure=departure + timedelta(hours=i), arrival=departure + timedelta(hours=i + 2),
+                    base_fare=4500, total_seats=120, seats_available=120)
+        for i in range(3)
+    ])
+    db.commit()
+    db.close()
+    with TestClient(main.app) as test_client:
+        yield test_client
@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+
+from backend import backtest
+from backend.main import Base
+from backend.pricing import DEFAULT_PRICING
+from backend.simulation import run_simulation
+
+
+def _history(tmp_path, flights=20, days=1.0):
+    """Seed `flights` flights and run the accelerated simulation over them; returns the history DB URL."""
+    seed_path = tmp_path / "seed.db"
+    engine = create_engine(f"sqlite:///{seed_path}")
+    Base.metadata.create_all(engine)
+    departure = datetime(2030, 1, 3)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO airlines (id, name, tier) VALUES (1, 'IndiGo', 'budget'), (2, 'Vistara', 'premium')"))
+        for i in range(flights):
+            conn.execute(text(
+                "INSERT INTO flights (flight_no, airline_id, origin, destination, departure, arrival, base_fare, "
+                "total_seats, seats_available) VALUES (:no, :airline, 'Delhi', 'Mumbai', :dep, :arr, :fare, 120, 120)"
+            ), {"no": f"6E{100 + i}", "airline": 1 + i % 2, "dep": departure + timedelta(hours=i),
+                "arr": departure + timedelta(hours=i + 2), "fare": 3000 + 50 * i})
+    engine.dispose()
+    history = tmp_path / "history.db"
+    run_simulation(str(seed_path), days=days, booking_rate=0.2, start=datetime(2030, 1, 1),
+                   scratch_path=str(history), keep=True)
+    return f"sqlite:///{history}"
+
+
+def _hand_built(tmp_path):
+    """
+    One premium flight (base 1000, 10 seats, 7 left) departing 2030-01-10, with
+    three bookings and the quotes shown before them:
+      B1 2030-01-05 00:00 paid 1200, quote 1150 -> 9/10 free, 120h out, demand 0.52
+      B2 2030-01-09 12:00 paid 1500, quote 1450 -> 8/10 free, 12h out, demand 0.70
+      B3 2030-01-09 18:00 paid 1700, cancelled (never revenue)
+    The 9999 quote is recorded at B2's own timestamp, so only B3 may see it.
+    A second, unknown-tier flight has one booking to compare the two evaluators.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'hand.db'}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO airlines (id, name, tier) VALUES (1, 'Vistara', 'premium'), (2, 'Charter', 'charter')"))
+        conn.execute(text(
+            "INSERT INTO flights (id, flight_no, airline_id, origin, destination, departure, arrival, base_fare, "
+            "total_seats, seats_available) VALUES "
+            "(1, 'UK100', 1, 'Delhi', 'Mumbai', '2030-01-10 00:00:00.000000', '2030-01-10 02:00:00.000000', 1000, 10, 7), "
+            "(2, 'CH200', 2, 'Delhi', 'Goa', '2030-01-10 00:00:00.000000', '2030-01-10 02:30:00.000000', 2000, 10, 8)"))
+        conn.execute(text(
+            "INSERT INTO bookings (pnr, flight_id, passenger_name, price_paid, status, created_at) VALUES "
+            "('B1', 1, 'A', 1200, 'CONFIRMED', '2030-01-05 00:00:00.000000'), "
+            "('B2', 1, 'B', 1500, 'CONFIRMED', '2030-01-09 12:00:00.000000'), "
+            "('B3', 1, 'C', 1700, 'CANCELLED', '2030-01-09 18:00:00.000000'), "
+            "('C1', 2, 'D', 2100, 'CONFIRMED', '2030-01-08 00:00:00.000000')"))
+        conn.execute(text(
+            "INSERT INTO fare_history (flight_id, recorded_at, price) VALUES "
+            "(1, '2030-01-04 23:00:00.000000', 1150), (1, '2030-01-09 11:00:00.000000', 1450), "
+            "(1, '2030-01-09 12:00:00.000000', 9999), (2, '2030-01-07 00:00:00.000000', 2150)"))
+    engine.dispose()
+    return f"sqlite:///{tmp_path / 'hand.db'}"
+
+
+def _result(report, params):
+    return next(r for r in report["results"] if r["params"] == params.as_dict())
+
+
+def test_scenario_revenue_matches_hand_computation(tmp_path):
+    db_url = _hand_built(tmp_path)
+    scenario = DEFAULT_PRICING.with_overrides(seat_weight=0.9)
+    report = backtest.run_backtest([DEFAULT_PRICING, scenario], db_url, workers=1)
+
+    assert report["events"] == 4 and report["seats"] == 20
+    assert report["baseline"] == {"revenue": 4800.0, "bookings": 3, "load_factor": 0.15}
+    # flight 2 (unknown tier, priced as standard): 48h out -> mid factor 0.05, 9/10 free,
+    # quote 2150 -> demand 0.5 + (1.075 - 1.11) / 0.5 = 0.43
+    # defaults reprice every event to its quote
+    assert _result(report, DEFAULT_PRICING)["revenue"] == 1150 + 1450 + 2150
+    # seat_weight 0.9: B1 1 + 0.1*0.9 + 0.02*0.5 + 0.08 = 1.18 -> 1180 (<= 1200 * 1.15)
+    #                  B2 1 + 0.2*0.9 + 0.15 + 0.2*0.5 + 0.08 = 1.51 -> 1510 (<= 1500 * 1.15)
+    #                  C1 1 + 0.1*0.9 + 0.05 - 0.07*0.5 = 1.105 -> 2210 (<= 2100 * 1.15)
+    result = _result(report, scenario)
+    assert result["revenue"] == 1180 + 1510 + 2210
+    assert result["bookings"] == 3 and result["load_factor"] == 0.15
+
+
+def test_python_fallback_matches_numpy(tmp_path, monkeypatch):
+    db_url = _hand_built(tmp_path)
+    param_sets = [DEFAULT_PRICING, DEFAULT_PRICING.with_overrides(standard_factor=0.1, seat_weight=0.9)]
+    vectorized = backtest.run_backtest(param_sets, db_url, workers=1)
+    monkeypatch.setattr(backtest, "np", None)
+    fallback = backtest.run_backtest(param_sets, db_url, workers=1)
+
+    assert not fallback["vectorized"]
+    assert [(r["revenue"], r["bookings"]) for r in fallback["results"]] == \
+           [(r["revenue"], r["bookings"]) for r in vectorized["results"]]
+
+
+def test_default_pricing_stays_near_baseline(tmp_path):
+    db_url = _history(tmp_path)
+    report = backtest.run_backtest([DEFAULT_PRICING, DEFAULT_PRICING.with_overrides(seat_weight=0.9)], db_url, workers=1)
+
+    assert report["events"] > 0
+    drift, ok = backtest.check_baseline(report)
+    assert ok, f"default pricing replays at {drift:+.2%} vs baseline"
+    assert drift != 0  # demand comes from the quotes, not from the price paid
+
+
+def test_seat_fill_is_reconstructed_backwards(tmp_path):
+    db_url = _history(tmp_path, flights=1, days=0.5)
+    engine = create_engine(db_url)
+    with engine.connect() as conn:
+        available = conn.execute(text("SELECT seats_available FROM flights")).scalar_one()
+        held = conn.execute(text("SELECT COUNT(*) FROM bookings WHERE status != 'CANCELLED'")).scalar_one()
+    seat_pct = [p for batch in backtest.stream_events(engine) for p in batch.seat_pct]
+    engine.dispose()
+
+    # the last booking saw the current seats plus its own; earlier bookings saw more free seats
+    assert seat_pct[-1] == min(available + 1, 120) / 120
+    assert seat_pct[0] == min(available + held, 120) / 120
+    assert list(seat_pct) == sorted(seat_pct, reverse=True)
@@ -0,0 +1,36 @@
+from backend import main
+
+BOOKING = {"flight_id": 1, "passenger": {"passenger_name": "Asha Rao", "passenger_phone": None}}
+
+
+def _pending(key):
+    db = main.SessionLocal()
+    try:
+        row = db.get(main.IdempotencyKey, key)
+        return row is not None and row.status_code is None
+    finally:
+        db.close()
+
+
+def test_retry_replays_the_original_response(client):
+    headers = {"Idempotency-Key": "retry-1"}
+    first = client.post("/booking/initiate", json=BOOKING, headers=headers)
+    second = client.post("/booking/initiate", json=BOOKING, headers=headers)
+
+    assert first.status_code == second.status_code == 200
+    assert second.json() == first.json()
+    assert second.headers.get("Idempotent-Replayed") == "true"
+
+
+def test_unstored_response_does_not_leave_the_key_pending(client, monkeypatch):
+    def fail(*args):
+        raise main.OperationalError("UPDATE idempotency_keys", {}, Exception("database is locked"))
+
+    monkeypatch.setattr(main.idempotency, "_complete", fail)
+    headers = {"Idempotency-Key": "unstored-1"}
+    first = client.post("/booking/initiate", json=BOOKING, headers=headers)
+
+    assert first.status_code == 200
+    assert not _pending("booking/initiate:unstored-1")
+    replay = client.post("/booking/initiate", json=BOOKING, headers=headers)
+    assert replay.json() == first.json()
@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+
+from backend.inventory import FlightInventory
+from backend.routing import RouteIndex
+
+DEPARTURE = datetime(2030, 1, 1, 6)
+
+
+def _row(flight_id, seats=100, origin="Delhi", base_fare=4500):
+    return (flight_id, f"6E{flight_id}", 1, "IndiGo", "budget", origin, "Mumbai",
+            DEPARTURE, DEPARTURE + timedelta(hours=2), base_fare, 120, seats)
+
+
+def test_reconcile_applies_db_changes():
+    inventory = FlightInventory()
+    inventory.load([_row(1), _row(2), _row(3)])
+
+    changes = inventory.reconcile([_row(1, seats=90), _row(2, base_fare=5000), _row(4)], inventory.generation)
+
+    assert changes["seats"] == [(1, 90)]
+    assert [(old and old.id, new.id) for old, new in changes["replaced"]] == [(2, 2), (None, 4)]
+    assert [r.id for r in changes["removed"]] == [3]
+    assert inventory.get(2).base_fare == 5000 and inventory.get(3) is None
+
+
+def test_reconcile_keeps_writes_made_after_the_read():
+    inventory = FlightInventory()
+    inventory.load([_row(1), _row(2)])
+    since = inventory.generation
+    rows = [_row(1, seats=100)]  # read before the booking below committed
+    inventory.set_seats(1, 99)  # booking write-through
+    inventory.upsert(_row(5))  # flight added after the read
+
+    changes = inventory.reconcile(rows, since)
+
+    assert inventory.get(1).seats_available == 99
+    assert changes["seats"] == []
+    assert inventory.get(5) is not None
+    assert [r.id for r in changes["removed"]] == [2]
+
+
+def test_route_index_follows_upserts_in_order():
+    inventory = FlightInventory()
+    index = RouteIndex()
+    index.attach(inventory)
+    inventory.load([_row(1)])
+    inventory.upsert(_row(1, origin="Goa"))
+
+    assert index.size == 1
+    assert "delhi" not in index._by_origin or not index._by_origin["delhi"].lists[1]
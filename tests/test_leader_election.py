@@ -0,0 +1,197 @@
+"""
+Leader election: the step-down timer in-process, and single leadership plus
+failover across real `uvicorn --workers N` processes.
+
+The multi-worker test starts uvicorn against a scratch flights.db with a
+short lease TTL and simulator tick, and checks that:
+
+1. exactly one worker holds the lease and reports itself as leader
+   (sampled through /admin/leader on whichever workers answer)
+2. after the leader is killed with SIGKILL, another worker takes the
+   lease within one simulator tick
+3. after the new leader is stopped gracefully (SIGTERM), the lease is
+   handed over within one renew interval plus slack
+"""
+import asyncio
+import json
+import os
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.leader import LeaderLease
+from backend.main import Base, Lease
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKERS = 3
+TTL = 2.0  # lease TTL in seconds
+TICK = 5  # simulator interval in seconds
+SAMPLES = 60  # /admin/leader requests per check
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def lease_holder(db_path):
+    """Current (unexpired) lease holder straight from the DB, or None."""
+    if not os.path.exists(db_path):
+        return None
+    conn = sqlite3.connect(db_path, timeout=5)
+    try:
+        row = conn.execute("SELECT holder, expires_at FROM leases WHERE name = 'background-jobs'").fetchone()
+    except sqlite3.OperationalError:  # table not created yet
+        return None
+    finally:
+        conn.close()
+    return row[0] if row and row[1] > time.time() else None
+
+
+def holder_pid(holder):
+    return int(holder.split(":")[1])
+
+
+def wait_for(predicate, timeout, interval=0.05):
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        value = predicate()
+        if value:
+            return value, time.perf_counter() - started
+        time.sleep(interval)
+    return None, timeout
+
+
+def sample_leaders(url, samples):
+    """Ask /admin/leader `samples` times; returns ({worker: is_leader}, lease holders seen)."""
+    workers, holders = {}, set()
+    for _ in range(samples):
+        try:
+            with urllib.request.urlopen(url, timeout=2) as resp:
+                status = json.load(resp)
+        except (urllib.error.URLError, ConnectionError):
+            continue
+        workers[status["worker"]] = status["is_leader"]
+        if status["lease"]:
+            holders.add(status["lease"]["holder"])
+    return workers, holders
+
+
+def assert_single_leader(url, expected):
+    workers, holders = sample_leaders(url, SAMPLES)
+    leaders = [w for w, is_leader in workers.items() if is_leader]
+    assert leaders in ([], [expected]), f"leader claims: {leaders}, expected {expected}"
+    assert holders <= {expected}, f"lease holders seen: {holders}"
+
+
+@pytest.fixture
+def lease_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'leases.db'}")
+    Base.metadata.create_all(engine, tables=[Lease.__table__])
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def test_leader_steps_down_at_deadline_while_renew_blocks(lease_factory):
+    lease = LeaderLease(lease_factory, Lease, ttl=0.4)
+    renew = lease.try_acquire
+    calls = []
+
+    def blocked_renew():
+        calls.append(time.monotonic())
+        if len(calls) > 1:  # every renewal hangs on a locked database well past the deadline
+            time.sleep(1.0)
+        return renew()
+
+    lease.try_acquire = blocked_renew
+
+    async def scenario():
+        stopped = asyncio.Event()
+
+        async def leader_job():
+            try:
+                await asyncio.sleep(10)
+            finally:
+                stopped.set()
+
+        campaign = asyncio.create_task(lease.campaign([leader_job]))
+        await asyncio.wait_for(stopped.wait(), 0.8)
+        stepped_down = time.monotonic() - calls[0]
+        is_leader = lease.is_leader
+        campaign.cancel()
+        await asyncio.gather(campaign, return_exceptions=True)
+        return stepped_down, is_leader
+
+    stepped_down, is_leader = asyncio.run(scenario())
+    assert stepped_down <= lease.ttl + 0.1
+    assert not is_leader
+
+
+def test_cancel_during_first_claim_leaves_no_lease(lease_factory):
+    lease = LeaderLease(lease_factory, Lease, ttl=5)
+    acquire = lease.try_acquire
+
+    def slow_acquire():
+        time.sleep(0.3)  # still claiming when the campaign is cancelled
+        return acquire()
+
+    lease.try_acquire = slow_acquire
+
+    async def scenario():
+        campaign = asyncio.create_task(lease.campaign([]))
+        await asyncio.sleep(0.1)
+        campaign.cancel()
+        await asyncio.gather(campaign, return_exceptions=True)
+        await asyncio.sleep(0.4)  # give a stray claim time to land
+
+    asyncio.run(scenario())
+    assert lease.current() is None
+    assert not lease.is_leader
+
+
+@pytest.fixture
+def server(tmp_path):
+    port = _free_port()
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""),
+               FLIGHTSIM_LEADER_TTL=str(TTL), FLIGHTSIM_SIMULATOR_INTERVAL=str(TICK),
+               FLIGHTSIM_RATE_LIMITS="0", FLIGHTSIM_ADMIN="1")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port),
+         "--workers", str(WORKERS), "--log-level", "warning"],
+        cwd=tmp_path, env=env)
+    try:
+        yield f"http://127.0.0.1:{port}/admin/leader", str(tmp_path / "flights.db")
+    finally:
+        proc.send_signal(signal.SIGINT)
+        try:
+            proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def test_single_leader_and_failover(server):
+    url, db_path = server
+
+    first, elapsed = wait_for(lambda: lease_holder(db_path), 30)
+    assert first is not None, "no worker acquired the lease within 30s"
+    assert_single_leader(url, first)
+
+    os.kill(holder_pid(first), signal.SIGKILL)
+    second, elapsed = wait_for(lambda: (h := lease_holder(db_path)) and h != first and h, TICK * 2)
+    assert second is not None and elapsed <= TICK, f"failover after SIGKILL took {elapsed:.2f}s (tick {TICK}s)"
+    assert_single_leader(url, second)
+
+    os.kill(holder_pid(second), signal.SIGTERM)
+    third, elapsed = wait_for(lambda: (h := lease_holder(db_path)) and h not in (first, second) and h, TICK * 2)
+    assert third is not None and elapsed <= TTL / 4 + 1, f"handover after SIGTERM took {elapsed:.2f}s"
+    assert_single_leader(url, third)
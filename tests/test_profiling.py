@@ -0,0 +1,34 @@
+from backend import profiling
+
+
+def _profile(client, response):
+    assert response.status_code == 200, response.text
+    return client.get(f"/admin/profiles/{response.headers['X-Profile-Id']}").text
+
+
+def test_sample_covers_sync_handler_thread(client):
+    text = _profile(client, client.get("/flights", params={"profile": "sample"}))
+    assert "list_flights" in text
+
+
+def test_cprofile_covers_sync_handler_thread(client):
+    text = _profile(client, client.get("/flights", params={"profile": "cprofile"}))
+    assert "list_flights" in text
+
+
+def test_concurrent_cprofile_is_rejected(client):
+    with profiling._cprofile_lock:
+        response = client.get("/flights", params={"profile": "cprofile"})
+    assert response.status_code == 409
+    assert client.get("/flights", params={"profile": "cprofile"}).status_code == 200
+
+
+def test_unknown_profile_mode_is_rejected(client):
+    assert client.get("/flights", params={"profile": "bogus"}).status_code == 400
+
+
+def test_cprofile_covers_idempotent_booking_handler(client):
+    booking = {"flight_id": 1, "passenger": {"passenger_name": "Asha Rao", "passenger_phone": None}}
+    response = client.post("/booking/initiate", params={"profile": "cprofile"}, json=booking,
+                           headers={"Idempotency-Key": "profile-1"})
+    assert "_initiate_booking" in _profile(client, response)
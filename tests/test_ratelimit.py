@@ -0,0 +1,15 @@
+from backend import ratelimit
+
+
+def test_route_classes():
+    assert ratelimit.classify("GET", "/email_ticket/ABC123") == "expensive"
+    assert ratelimit.classify("GET", "/admin/profile/sample") == "expensive"
+    assert ratelimit.classify("GET", "/dynamic_price/1") == "pricing"
+    assert ratelimit.classify("POST", "/booking/initiate") == "write"
+    assert ratelimit.classify("GET", "/exports") == "read"
+
+
+def test_admin_status_routes_are_opt_in(client):
+    # conftest leaves FLIGHTSIM_ADMIN unset
+    for path in ("/admin/ratelimit", "/admin/leader", "/admin/inventory"):
+        assert client.get(path).status_code == 404
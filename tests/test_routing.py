@@ -0,0 +1,50 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+from backend.inventory import FlightRecord
+from backend.routing import RouteIndex
+
+DEPARTURE = datetime(2030, 3, 30, 23, 30)  # lands 01:30, before Berlin's 02:00 -> 03:00 DST jump
+
+
+def _record(flight_id, origin, destination, departs):
+    return FlightRecord(flight_id, f"6E{flight_id}", 1, "IndiGo", "budget", origin, destination,
+                        departs, departs + timedelta(hours=2), 4500, 120, 100)
+
+
+def _index(records):
+    index = RouteIndex()
+    index.build(records)
+    return index
+
+
+def test_remove_unknown_record_keeps_size():
+    known = _record(1, "Delhi", "Mumbai", DEPARTURE)
+    index = _index([known])
+
+    index.remove(_record(2, "Delhi", "Mumbai", DEPARTURE))
+    index.remove(known)
+    index.remove(known)
+
+    assert index.size == 0
+
+
+def test_search_does_not_depend_on_local_timezone(monkeypatch):
+    # a 90 minute layover that local-time keys in Berlin would shrink to 30, below the 45 minute minimum
+    records = [_record(1, "Delhi", "Mumbai", DEPARTURE), _record(2, "Mumbai", "Goa", DEPARTURE + timedelta(hours=3, minutes=30))]
+
+    def search():
+        index = _index(records)
+        legs = index.search("Delhi", "Goa", DEPARTURE - timedelta(minutes=30), DEPARTURE + timedelta(minutes=30),
+                            price_fn=lambda r: r.base_fare)
+        return [[leg.id for leg in itinerary.legs] for itinerary in legs]
+
+    results = []
+    for tz in ("UTC", "Europe/Berlin", "Asia/Kolkata"):
+        monkeypatch.setenv("TZ", tz)
+        time.tzset()
+        results.append(search())
+    monkeypatch.delenv("TZ")
+    time.tzset()
+    assert results == [[[1, 2]]] * 3
@@ -0,0 +1,45 @@
+import pytest
+
+from backend import serialization
+from backend.serialization import ARROW, JSON, MSGPACK, compress, negotiate
+
+BODY = b"x" * (serialization.COMPRESS_MIN_BYTES + 1)
+
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, JSON),
+    ("*/*", JSON),
+    ("application/x-msgpack", MSGPACK),
+    ("application/json, application/x-msgpack", MSGPACK),
+    ("application/x-msgpack;q=0.5, application/json", JSON),
+    ("application/x-msgpack;q=0.5, */*", JSON),
+    ("application/x-msgpack;q=0, application/vnd.apache.arrow.stream;q=0.2", ARROW),
+    ("application/x-msgpack;q=0", JSON),
+    ("*/*;q=0, application/x-msgpack;q=0.1", MSGPACK),
+    ("Application/X-Msgpack ; Q=0.9", MSGPACK),
+])
+def test_negotiate_picks_the_highest_q(accept, expected):
+    assert negotiate(accept) == expected
+
+
+def test_negotiate_skips_missing_libraries(monkeypatch):
+    monkeypatch.setattr(serialization, "msgpack", None)
+    assert negotiate("application/x-msgpack") == JSON
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    (None, None),
+    ("gzip, deflate, br", "br"),
+    ("br;q=0, gzip", "gzip"),
+    ("br;q=0.5, gzip;q=0.8", "gzip"),
+    ("abr, gzip;q=0", None),
+    ("*", "br"),
+    ("*;q=0.1, br;q=0", "gzip"),
+    ("identity", None),
+])
+def test_compress_respects_q_values(accept_encoding, expected):
+    assert compress(BODY, accept_encoding)[1] == expected
+
+
+def test_small_bodies_are_not_compressed():
+    assert compress(b"{}", "br, gzip") == (b"{}", None)
@@ -0,0 +1,55 @@
+from datetime import datetime
+
+from sqlalchemy import insert, select, text, update
+
+from backend.main import Airline, Base, Flight
+from backend.sharding import ShardRouter
+
+AIRLINES = Airline.__table__
+
+
+def _router(tmp_path):
+    shards = ShardRouter([f"sqlite:///{tmp_path / 'shard0.db'}", f"sqlite:///{tmp_path / 'shard1.db'}"])
+    shards.create_all(Base.metadata)
+    return shards
+
+
+def _airlines(shards, sid):
+    with shards.engines[sid].connect() as conn:
+        return conn.execute(select(AIRLINES.c.id, AIRLINES.c.name, AIRLINES.c.tier).order_by(AIRLINES.c.id)).all()
+
+
+def _writes(shards):
+    with shards.engines["1"].connect() as conn:
+        return sorted(conn.execute(text("SELECT op, id FROM airline_writes")).all(), key=lambda w: w[1])
+
+
+def test_replicate_upserts_without_touching_live_rows(tmp_path):
+    shards = _router(tmp_path)
+    with shards.engines["0"].begin() as conn:
+        conn.execute(insert(AIRLINES), [{"id": 1, "name": "IndiGo", "tier": "budget"},
+                                        {"id": 2, "name": "Vistara", "tier": "premium"}])
+    shards.replicate(AIRLINES)
+    assert _airlines(shards, "1") == _airlines(shards, "0")
+
+    # a flight on shard 1 references airline 1; count every write a re-run makes to shard 1's airlines
+    with shards.engines["1"].begin() as conn:
+        conn.execute(insert(Flight.__table__).values(
+            id=1, flight_no="6E1", airline_id=1, origin="Delhi", destination="Mumbai",
+            departure=datetime(2030, 1, 1, 6), arrival=datetime(2030, 1, 1, 8),
+            base_fare=4500, total_seats=120, seats_available=120))
+        conn.execute(text("CREATE TABLE airline_writes (op TEXT, id INTEGER)"))
+        for op in ("INSERT", "UPDATE", "DELETE"):
+            row = "OLD" if op == "DELETE" else "NEW"
+            conn.execute(text(f"CREATE TRIGGER log_{op} AFTER {op} ON airlines "
+                              f"BEGIN INSERT INTO airline_writes VALUES ('{op}', {row}.id); END"))
+    shards.replicate(AIRLINES)
+    assert _writes(shards) == []
+
+    with shards.engines["0"].begin() as conn:
+        conn.execute(update(AIRLINES).where(AIRLINES.c.id == 2).values(tier="standard"))
+        conn.execute(insert(AIRLINES).values(id=3, name="Akasa", tier="budget"))
+    shards.replicate(AIRLINES)
+
+    assert _writes(shards) == [("UPDATE", 2), ("INSERT", 3)]
+    assert _airlines(shards, "1") == [(1, "IndiGo", "budget"), (2, "Vistara", "standard"), (3, "Akasa", "budget")]